@@ -1,8 +1,10 @@
 import logging
 
 from fastapi import FastAPI
+from app.database import invalidation
 from app.database.models import engine
-from app.api.models_api import users_api, events_api, tasks_api
+from app.api.models_api import users_api, events_api, tasks_api, media_api
+from app.media.catalog import media_catalog
 from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
@@ -12,6 +14,7 @@ app = FastAPI(title="Kislorod API")
 app.include_router(users_api.router)
 app.include_router(events_api.router)
 app.include_router(tasks_api.router)
+app.include_router(media_api.router)
 
 @app.on_event("startup")
 async def on_startup():
@@ -21,11 +24,14 @@ async def on_startup():
         logger.info("Database connection verified for API")
     except Exception as e:
         logger.error("Failed to connect to database: %s", e, exc_info=True)
+    await media_catalog.refresh()
 
 @app.on_event("shutdown")
 async def on_shutdown():
     """Закрытие соединений с БД при остановке API"""
     from app.database.models import engine
+    # Отправляем накопившиеся события инвалидации до закрытия пула
+    await invalidation.flush()
     logger.info("Closing database connections...")
     await engine.dispose()
     logger.info("Database connections closed")
\ No newline at end of file
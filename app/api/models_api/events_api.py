@@ -5,6 +5,7 @@ from pydantic import BaseModel, ConfigDict, Field
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database import invalidation
 from app.database.models import Event
 from app.api.deps import get_session, admin_auth
 
@@ -59,6 +60,7 @@ async def create_event(payload: EventCreate, session: AsyncSession = Depends(get
    session.add(event)
    await session.commit()
    await session.refresh(event)
+   invalidation.publish('events', event_id=event.id)
    return event
 
 @router.put("/{event_id}", response_model=EventOut, dependencies=[Depends(admin_auth)])
@@ -72,6 +74,7 @@ async def update_event(event_id: int, payload: EventUpdate, session: AsyncSessio
    session.add(event)
    await session.commit()
    await session.refresh(event)
+   invalidation.publish('events', event_id=event.id)
    return event
 
 @router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(admin_auth)])
@@ -81,4 +84,5 @@ async def delete_event(event_id: int, session: AsyncSession = Depends(get_sessio
       raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
    await session.delete(event)
    await session.commit()
+   invalidation.publish('events', event_id=event_id)
    return None
\ No newline at end of file
@@ -0,0 +1,35 @@
+from typing import Dict, List, Optional
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+
+from app.media.catalog import media_catalog
+from app.api.deps import admin_auth
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+class MediaGapsOut(BaseModel):
+    start: Optional[date]
+    end: Optional[date]
+    gaps: Dict[str, List[date]]
+
+@router.get("/gaps", response_model=MediaGapsOut, dependencies=[Depends(admin_auth)])
+async def get_media_gaps(start: Optional[date] = None, end: Optional[date] = None):
+    """List calendar days without content for every media kind (admin only)"""
+    await media_catalog.refresh()
+
+    # По умолчанию проверяем период от первого до последнего дня, для которого есть хоть что-то
+    explicit_end = end is not None
+    days = [day for kind in media_catalog.kinds for day in media_catalog.days(kind)]
+    start = start or min(days, default=None)
+    end = end or max(days, default=None)
+    if start is None or end is None:
+        return MediaGapsOut(start=start, end=end, gaps={})
+    if start > end and not explicit_end:
+        # Начало периода позже последнего дня с контентом - проверять нечего
+        return MediaGapsOut(start=start, end=end, gaps={})
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+
+    gaps = {kind: media_catalog.gaps(kind, start, end) for kind in media_catalog.kinds}
+    return MediaGapsOut(start=start, end=end, gaps=gaps)
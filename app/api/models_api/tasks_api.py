@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database import invalidation
 from app.database.models import Task
 from app.api.deps import get_session, admin_auth
 
@@ -16,6 +17,7 @@ class TaskCreate(BaseModel):
     type: str  # 'TF', 'AI', or 'DISH'
     description: Optional[str] = None
     correct_answer: str  # 'true'/'false' for TF, text answer for AI/DISH
+    accepted_answers: Optional[List[str]] = None  # other spellings accepted for AI
     score: int
 
 class TaskUpdate(BaseModel):
@@ -24,6 +26,7 @@ class TaskUpdate(BaseModel):
     type: Optional[str] = None
     description: Optional[str] = None
     correct_answer: Optional[str] = None
+    accepted_answers: Optional[List[str]] = None
     score: Optional[int] = None
 
 class TaskOut(BaseModel):
@@ -33,6 +36,7 @@ class TaskOut(BaseModel):
     type: str
     description: Optional[str]
     correct_answer: str
+    accepted_answers: Optional[List[str]]
     score: int
 
     model_config = {"from_attributes": True}
@@ -67,11 +71,13 @@ async def create_task(payload: TaskCreate, session: AsyncSession = Depends(get_s
         type=payload.type,
         description=payload.description,
         correct_answer=payload.correct_answer,
+        accepted_answers=payload.accepted_answers,
         score=payload.score
     )
     session.add(task)
     await session.commit()
     await session.refresh(task)
+    invalidation.publish('tasks', task_id=task.id)
     return task
 
 @router.put("/{task_id}", response_model=TaskOut, dependencies=[Depends(admin_auth)])
@@ -95,6 +101,7 @@ async def update_task(task_id: int, payload: TaskUpdate, session: AsyncSession =
     session.add(task)
     await session.commit()
     await session.refresh(task)
+    invalidation.publish('tasks', task_id=task.id)
     return task
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(admin_auth)])
@@ -106,4 +113,5 @@ async def delete_task(task_id: int, session: AsyncSession = Depends(get_session)
     
     await session.delete(task)
     await session.commit()
+    invalidation.publish('tasks', task_id=task_id)
     return None
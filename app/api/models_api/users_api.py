@@ -4,6 +4,7 @@ from pydantic import BaseModel, ConfigDict
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database import invalidation
 from app.database.models import User
 from app.api.deps import get_session, admin_auth
 
@@ -56,6 +57,13 @@ async def create_user(payload: UserCreate, session: AsyncSession = Depends(get_s
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    invalidation.publish(
+        'users',
+        user_id=user.id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        score=user.score,
+    )
     return user
 
 @router.put("/{user_id}", response_model=UserOut, dependencies=[Depends(admin_auth)])
@@ -69,6 +77,13 @@ async def update_user(user_id: int, payload: UserUpdate, session: AsyncSession =
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    invalidation.publish(
+        'users',
+        user_id=user.id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        score=user.score,
+    )
     return user
 
 
@@ -79,4 +94,5 @@ async def delete_user(user_id: int, session: AsyncSession = Depends(get_session)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     await session.delete(user)
     await session.commit()
+    invalidation.publish('users', user_id=user_id, deleted=True)
     return None
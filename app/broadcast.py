@@ -0,0 +1,169 @@
+"""
+Resumable broadcasts of daily media to every registered user.
+
+Recipients are streamed from the users table in batches; each batch's
+outcome is written to broadcast_deliveries, so a restarted broadcast skips
+everyone already handled. The photo goes out by one cached file_id.
+
+   python -m app.broadcast [--date YYYY-MM-DD]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from functools import partial
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+
+import app.database.requests as db_requests
+from app.helpers.time_helper import moscow_today
+from app.media import MediaEntry, load_file_ids, media_catalog, send_media
+from app.middlewares.send_queue import SendQueueMiddleware, SendScheduler, bulk_sending
+from config import TOKEN, SEND_RATE_PER_SECOND, SEND_CHAT_RATE, SEND_CHAT_BURST
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+CONCURRENCY = 20
+# Как часто писать в лог прогресс рассылки (сек)
+PROGRESS_INTERVAL = 10
+# Через сколько повторять рассылку, если часть получателей отложена (сек)
+RETRY_DELAY = 300
+
+
+@dataclass(slots=True)
+class BroadcastProgress:
+   total: int
+   sent: int = 0
+   blocked: int = 0
+   failed: int = 0
+   deferred: int = 0
+   started: float = field(default_factory=time.monotonic)
+
+   @property
+   def done(self) -> int:
+      return self.sent + self.blocked + self.failed + self.deferred
+
+   @property
+   def rate(self) -> float:
+      elapsed = time.monotonic() - self.started
+      return self.done / elapsed if elapsed > 0 else 0.0
+
+   @property
+   def eta(self) -> float | None:
+      rate = self.rate
+      return (self.total - self.done) / rate if rate else None
+
+   def __str__(self) -> str:
+      eta = f"{self.eta:.0f} s" if self.eta is not None else "?"
+      return (
+         f"{self.done}/{self.total} ({self.rate:.1f}/s, ETA {eta}): "
+         f"{self.sent} sent, {self.blocked} blocked, {self.failed} failed, {self.deferred} deferred"
+      )
+
+
+async def broadcast_media(
+   bot: Bot,
+   kind: str,
+   day: date,
+   entry: MediaEntry,
+   batch_size: int = BATCH_SIZE,
+   concurrency: int = CONCURRENCY,
+) -> BroadcastProgress | None:
+   """
+   Send `entry` to every user who has not got broadcast (kind, day) yet.
+   Returns None if that broadcast has already finished.
+   """
+   broadcast = await db_requests.get_or_create_broadcast(kind, day)
+   if broadcast.finished_at:
+      logger.info("Broadcast %s for %s already finished", kind, day)
+      return None
+
+   progress = BroadcastProgress(total=await db_requests.count_pending_recipients(broadcast.id))
+   logger.info("Broadcast %s for %s: %d recipients left", kind, day, progress.total)
+   semaphore = asyncio.Semaphore(concurrency)
+
+   async def deliver(user_id: int, results: list[tuple[int, str, str | None]]) -> None:
+      async with semaphore:
+         try:
+            await send_media(partial(bot.send_photo, user_id), entry)
+            progress.sent += 1
+            results.append((user_id, 'sent', None))
+         except TelegramForbiddenError:
+            progress.blocked += 1
+            results.append((user_id, 'blocked', None))
+         except (TelegramRetryAfter, TelegramNetworkError) as e:
+            # Не записываем: получатель достанется следующему запуску
+            logger.warning("Broadcast to %s deferred: %s", user_id, e)
+            progress.deferred += 1
+         except TelegramAPIError as e:
+            progress.failed += 1
+            results.append((user_id, 'failed', str(e)[:256]))
+         except Exception as e:
+            # Ошибка на нашей стороне (например, чтение файла) - тоже оставляем следующему запуску
+            logger.error("Broadcast to %s deferred: %s", user_id, e, exc_info=True)
+            progress.deferred += 1
+
+   last_report = time.monotonic()
+   with bulk_sending():
+      async for batch in db_requests.iter_pending_recipients(broadcast.id, batch_size):
+         results: list[tuple[int, str, str | None]] = []
+         try:
+            await asyncio.gather(*(deliver(user_id, results) for user_id in batch))
+         finally:
+            # Даже при остановке посреди пачки сохраняем, кому уже отправили, чтобы не повторять
+            await db_requests.record_deliveries(broadcast.id, results)
+
+         if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            logger.info("Broadcast %s for %s: %s", kind, day, progress)
+            last_report = time.monotonic()
+
+   if progress.deferred:
+      logger.warning("Broadcast %s for %s paused: %s", kind, day, progress)
+   else:
+      await db_requests.finish_broadcast(broadcast.id)
+      logger.info("Broadcast %s for %s finished: %s", kind, day, progress)
+   return progress
+
+async def broadcast_daily_message(bot: Bot, day: date | None = None) -> BroadcastProgress | None:
+   """Push the advent message of the day (public/message) to every participant."""
+   day = day or moscow_today()
+   entry = await media_catalog.get('message', day)
+   if not entry:
+      logger.warning("No message image for %s, nothing to broadcast", day)
+      return None
+   return await broadcast_media(bot, 'message', day, entry)
+
+
+async def _main(day: date | None) -> None:
+   from app.database.models import engine
+
+   bot = Bot(token=TOKEN)
+   bot.session.middleware(SendQueueMiddleware(
+      SendScheduler(rate=SEND_RATE_PER_SECOND, chat_rate=SEND_CHAT_RATE, chat_burst=SEND_CHAT_BURST)
+   ))
+   try:
+      await media_catalog.refresh()
+      await load_file_ids()
+      await broadcast_daily_message(bot, day)
+   finally:
+      await bot.session.close()
+      await engine.dispose()
+
+def main(argv: list[str] | None = None) -> None:
+   parser = argparse.ArgumentParser(description="Send the daily message to all participants")
+   parser.add_argument('--date', type=date.fromisoformat, default=None, help="day of the message (default: today, Moscow)")
+   args = parser.parse_args(argv)
+   asyncio.run(_main(args.date))
+
+if __name__ == '__main__':
+   logging.basicConfig(
+      level=logging.INFO,
+      format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+      handlers=[logging.StreamHandler(sys.stdout)]
+   )
+   main()
@@ -0,0 +1,192 @@
+"""
+FSM storage for aiogram kept in the fsm_states table.
+
+Reads are served from a local cache (entries live FSM_CACHE_TTL seconds after
+the last access); keys known to have no stored state are remembered without
+a TTL, so stray messages of users outside any scenario never reach Postgres.
+Writes update the cache at once and reach Postgres in batches a moment later. Other bot processes drop their cached copy through
+the 'fsm' invalidation topic, so several replicas can share the storage.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import invalidation
+from app.database.models import FsmState, async_session
+
+logger = logging.getLogger(__name__)
+
+FSM_CACHE_TTL = 600
+# Изменения копятся столько секунд и пишутся одним запросом
+FLUSH_DELAY = 0.1
+# Ключей в одном уведомлении для других процессов (NOTIFY ограничен 8000 байт)
+NOTIFY_CHUNK = 100
+
+
+@dataclass(slots=True)
+class _Record:
+   state: str | None = None
+   data: dict[str, Any] = field(default_factory=dict)
+   expires_at: float = 0.0
+
+   @property
+   def is_empty(self) -> bool:
+      return self.state is None and not self.data
+
+
+class PostgresStorage(BaseStorage):
+   def __init__(self, ttl: float = FSM_CACHE_TTL):
+      self._ttl = ttl
+      self._key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+      self._cache: dict[str, _Record] = {}
+      self._loading: dict[str, asyncio.Task] = {}
+      self._dirty: set[str] = set()
+      # Ключи без записи в БД (пустое состояние) - помним без TTL, это дешево
+      self._absent: set[str] = set()
+      self._flush_task: asyncio.Task | None = None
+      # Отложенные сбросы, которые уже пишут в БД: их дожидается close()
+      self._writing: set[asyncio.Task] = set()
+      invalidation.subscribe('fsm', self._on_invalidation)
+
+   async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+      record_key = self._key_builder.build(key)
+      record = await self._get(record_key)
+      record.state = state.state if isinstance(state, State) else state
+      self._mark_dirty(record_key)
+
+   async def get_state(self, key: StorageKey) -> str | None:
+      return (await self._get(self._key_builder.build(key))).state
+
+   async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+      if not isinstance(data, dict):
+         raise TypeError(f"Data must be a dict, not {type(data).__name__}")
+      record_key = self._key_builder.build(key)
+      record = await self._get(record_key)
+      record.data = data.copy()
+      self._mark_dirty(record_key)
+
+   async def get_data(self, key: StorageKey) -> dict[str, Any]:
+      return (await self._get(self._key_builder.build(key))).data.copy()
+
+   async def close(self) -> None:
+      if self._flush_task and not self._flush_task.done():
+         self._flush_task.cancel()
+      if self._writing:
+         await asyncio.gather(*self._writing, return_exceptions=True)
+      await self.flush()
+
+   async def _get(self, key: str) -> _Record:
+      record = self._cache.get(key)
+      now = time.monotonic()
+      # Пустая запись, даже устаревшая, ничего не скрывает: чужие изменения придут событием 'fsm'
+      if record is not None and (key in self._dirty or record.expires_at > now or record.is_empty):
+         record.expires_at = now + self._ttl
+         return record
+      if record is None and key in self._absent:
+         # Записи нет и в БД - пустое состояние без запроса
+         self._absent.discard(key)
+         record = self._cache[key] = _Record(expires_at=now + self._ttl)
+         return record
+
+      # Одновременные промахи по одному ключу ждут один запрос
+      task = self._loading.get(key)
+      if task is None:
+         task = asyncio.create_task(self._load(key))
+         self._loading[key] = task
+         task.add_done_callback(lambda _: self._loading.pop(key, None))
+      return await asyncio.shield(task)
+
+   async def _load(self, key: str) -> _Record:
+      async with async_session() as session:
+         row = (await session.execute(
+            select(FsmState.state, FsmState.data).where(FsmState.key == key)
+         )).first()
+      # Пока читали, запись могла измениться локально - локальная новее
+      record = self._cache.get(key)
+      if record is not None and key in self._dirty:
+         return record
+      record = _Record(row.state, dict(row.data or {})) if row else _Record()
+      self._absent.discard(key)
+      record.expires_at = time.monotonic() + self._ttl
+      self._cache[key] = record
+      return record
+
+   def _mark_dirty(self, key: str) -> None:
+      self._dirty.add(key)
+      if self._flush_task is None or self._flush_task.done():
+         self._flush_task = asyncio.create_task(self._flush_later())
+
+   async def _flush_later(self) -> None:
+      await asyncio.sleep(FLUSH_DELAY)
+      # Изменения, пришедшие во время записи, запланируют следующую пачку
+      self._flush_task = None
+      task = asyncio.current_task()
+      self._writing.add(task)
+      try:
+         await self.flush()
+      finally:
+         self._writing.discard(task)
+
+   async def flush(self) -> None:
+      """Write all pending changes: one upsert for live records, one delete for cleared ones."""
+      self._evict_expired()
+      if not self._dirty:
+         return
+      keys, self._dirty = self._dirty, set()
+      records = {key: self._cache.get(key) or _Record() for key in keys}
+      cleared = [key for key, record in records.items() if record.is_empty]
+      live = [
+         {'key': key, 'state': record.state, 'data': record.data}
+         for key, record in records.items() if key not in cleared
+      ]
+      try:
+         async with async_session() as session:
+            if live:
+               stmt = insert(FsmState).values(live)
+               await session.execute(stmt.on_conflict_do_update(
+                  index_elements=[FsmState.key],
+                  set_={'state': stmt.excluded.state, 'data': stmt.excluded.data, 'updated_at': func.now()}
+               ))
+            if cleared:
+               await session.execute(delete(FsmState).where(FsmState.key.in_(cleared)))
+            await session.commit()
+      except Exception as e:
+         logger.error("Failed to save %d FSM records: %s", len(keys), e, exc_info=True)
+         # Не теряем изменения: попробуем еще раз со следующей пачкой
+         self._dirty |= keys
+         if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+         return
+
+      keys = sorted(keys)
+      for i in range(0, len(keys), NOTIFY_CHUNK):
+         invalidation.publish_remote('fsm', keys=keys[i:i + NOTIFY_CHUNK])
+
+   def _evict_expired(self) -> None:
+      now = time.monotonic()
+      expired = [
+         key for key, record in self._cache.items()
+         if record.expires_at <= now and key not in self._dirty
+      ]
+      for key in expired:
+         record = self._cache.pop(key)
+         if record.is_empty:
+            self._absent.add(key)
+
+   def _on_invalidation(self, data: dict[str, Any]) -> None:
+      keys = data.get('keys')
+      if keys is None:
+         # Полный сброс: забываем все, что уже записано в БД
+         keys = list(self._cache)
+         self._absent.clear()
+      for key in keys:
+         self._absent.discard(key)
+         if key not in self._dirty:
+            self._cache.pop(key, None)
@@ -0,0 +1,138 @@
+"""
+Cache invalidation events shared between the bot and the admin API.
+
+publish() notifies local subscribers immediately and forwards the event to
+other processes through Postgres NOTIFY; the listener started by
+start_listener() delivers events published elsewhere. Subscribers are plain
+callables receiving the event data; an empty dict means "anything may have
+changed" (e.g. after a reconnect).
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from typing import Any, Callable
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine.url import make_url
+
+from app.database.models import engine
+from config import TARGET_DB_URL
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'kislorod_invalidation'
+# Пачка уведомлений уходит в БД одним запросом не чаще раза в FLUSH_DELAY секунд
+FLUSH_DELAY = 0.05
+RECONNECT_DELAY = 5
+
+Subscriber = Callable[[dict[str, Any]], None]
+
+_origin = uuid.uuid4().hex
+_subscribers: dict[str, list[Subscriber]] = defaultdict(list)
+_pending: list[str] = []
+_flush_task: asyncio.Task | None = None
+_listener_task: asyncio.Task | None = None
+
+
+def subscribe(topic: str, callback: Subscriber) -> None:
+   _subscribers[topic].append(callback)
+
+def _dispatch(topic: str, data: dict[str, Any]) -> None:
+   for callback in _subscribers.get(topic, ()):
+      try:
+         callback(data)
+      except Exception as e:
+         logger.error("Invalidation subscriber for %s failed: %s", topic, e, exc_info=True)
+
+def _dispatch_all() -> None:
+   for topic in list(_subscribers):
+      _dispatch(topic, {})
+
+def publish(topic: str, **data: Any) -> None:
+   """Notify subscribers of this process now and of other processes shortly after."""
+   _dispatch(topic, data)
+   publish_remote(topic, **data)
+
+def publish_remote(topic: str, **data: Any) -> None:
+   """Notify only other processes, when this one has already updated its own caches."""
+   global _flush_task
+
+   _pending.append(json.dumps({'origin': _origin, 'topic': topic, 'data': data}))
+   if _flush_task is None or _flush_task.done():
+      _flush_task = asyncio.create_task(_flush_later())
+
+async def _flush_later() -> None:
+   await asyncio.sleep(FLUSH_DELAY)
+   await flush()
+
+async def flush() -> None:
+   if not _pending:
+      return
+   payloads = list(dict.fromkeys(_pending))
+   _pending.clear()
+   try:
+      async with engine.connect() as conn:
+         await conn.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {'channel': CHANNEL, 'payloads': payloads}
+         )
+         await conn.commit()
+   except Exception as e:
+      logger.error("Failed to publish %d invalidation events: %s", len(payloads), e, exc_info=True)
+
+def _on_notification(connection: Any, pid: int, channel: str, payload: str) -> None:
+   try:
+      event = json.loads(payload)
+   except ValueError:
+      logger.warning("Malformed invalidation payload: %r", payload)
+      return
+   if event.get('origin') != _origin:
+      _dispatch(event['topic'], event.get('data') or {})
+
+async def _listen() -> None:
+   url = make_url(TARGET_DB_URL)
+   while True:
+      try:
+         conn = await asyncpg.connect(
+            user=url.username,
+            password=url.password,
+            host=url.host,
+            port=url.port,
+            database=url.database,
+         )
+      except Exception as e:
+         logger.error("Invalidation listener failed to connect: %s", e)
+         await asyncio.sleep(RECONNECT_DELAY)
+         continue
+
+      closed = asyncio.Event()
+      conn.add_termination_listener(lambda _: closed.set())
+      try:
+         await conn.add_listener(CHANNEL, _on_notification)
+         # Пока соединения не было, события могли потеряться - сбрасываем все кэши
+         _dispatch_all()
+         logger.info("Listening for cache invalidation events")
+         await closed.wait()
+         logger.warning("Invalidation listener connection lost, reconnecting")
+      finally:
+         if not conn.is_closed():
+            await conn.close()
+
+def start_listener() -> None:
+   global _listener_task
+   if _listener_task is None:
+      _listener_task = asyncio.create_task(_listen())
+
+async def stop_listener() -> None:
+   global _listener_task
+   if _listener_task is not None:
+      _listener_task.cancel()
+      try:
+         await _listener_task
+      except asyncio.CancelledError:
+         pass
+      _listener_task = None
+   await flush()
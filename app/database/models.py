@@ -1,7 +1,8 @@
 import logging
 
-from sqlalchemy import Integer, BigInteger, String, DateTime, Date
-from sqlalchemy import Column, Enum, ForeignKey, UniqueConstraint, func, text
+from sqlalchemy import Integer, BigInteger, String, DateTime, Date, ARRAY
+from sqlalchemy import Column, Enum, ForeignKey, Index, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -26,6 +27,8 @@ class Base(AsyncAttrs, DeclarativeBase):
 
 class User(Base):
     __tablename__ = 'users'
+    # Рейтинг читается по (score DESC, id DESC) прямо из индекса
+    __table_args__ = (Index('ix_users_score_id', 'score', 'id'),)
 
     # Use Telegram id as the primary key (BigInteger). Remove separate `tg_id`.
     # Telegram id is unique per user and suits being a primary key here.
@@ -39,6 +42,7 @@ class User(Base):
 
 class Event(Base):
     __tablename__ = 'events'
+    __table_args__ = (Index('ix_events_date', 'date'),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(256), nullable=False)
@@ -73,6 +77,8 @@ class Task(Base):
     )
     description: Mapped[str | None] = mapped_column(String(512), nullable=True)
     correct_answer: Mapped[str] = mapped_column(String(512), nullable=False)
+    # Другие написания ответа, которые тоже засчитываются (для AI-заданий)
+    accepted_answers: Mapped[list[str] | None] = mapped_column(ARRAY(String(512)), nullable=True)
     score: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
 
@@ -92,11 +98,76 @@ class TaskCompletion(Base):
     user = relationship("User", back_populates="task_completions")
     task = relationship("Task", back_populates="completions")
 
+class MediaFile(Base):
+    __tablename__ = 'media_files'
+    __table_args__ = (UniqueConstraint('path', 'content_hash', name='uq_media_path_hash'),)
+
+    # Telegram file_id, полученный после первой загрузки файла из public/.
+    # Ключ - путь плюс sha256 содержимого, поэтому замена картинки приводит к новой загрузке.
+    id: Mapped[int] = mapped_column(primary_key=True)
+    path: Mapped[str] = mapped_column(String(512), nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    file_id: Mapped[str] = mapped_column(String(256), nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+
+class Broadcast(Base):
+    __tablename__ = 'broadcasts'
+    __table_args__ = (UniqueConstraint('kind', 'day', name='uq_broadcast_kind_day'),)
+
+    # Рассылка одного материала (например, послания дня) всем участникам
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    day: Mapped[Date] = mapped_column(Date, nullable=False)
+    started_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    finished_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
+
+    deliveries = relationship("BroadcastDelivery", back_populates="broadcast", cascade="all, delete-orphan")
+
+class BroadcastDelivery(Base):
+    __tablename__ = 'broadcast_deliveries'
+
+    # Строка на каждого получателя: по ним рассылка продолжается после перезапуска
+    broadcast_id: Mapped[int] = mapped_column(ForeignKey('broadcasts.id', ondelete='CASCADE'), primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # sent / blocked / failed
+    error: Mapped[str | None] = mapped_column(String(256), nullable=True)
+    delivered_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+
+    broadcast = relationship("Broadcast", back_populates="deliveries")
+
+class JobRun(Base):
+    __tablename__ = 'job_runs'
+
+    # Последний отработанный запуск каждой задачи планировщика, для догоняющих запусков после простоя
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_slot: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    finished_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class FsmState(Base):
+    __tablename__ = 'fsm_states'
+
+    # Состояние FSM aiogram; ключ собирает DefaultKeyBuilder (бот, чат, пользователь, destiny)
+    key: Mapped[str] = mapped_column(String(256), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(256), nullable=True)
+    data: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+# create_all не трогает уже существующие таблицы, поэтому индексы и колонки,
+# добавленные в модели позже, создаем отдельными идемпотентными запросами
+SCHEMA_UPGRADES = [
+   'CREATE INDEX IF NOT EXISTS ix_users_score_id ON users (score, id)',
+   'ALTER TABLE tasks ADD COLUMN IF NOT EXISTS accepted_answers VARCHAR(512)[]',
+   'CREATE INDEX IF NOT EXISTS ix_events_date ON events (date)',
+]
+
 async def async_main():
    try:
       logger.info("Creating database tables...")
       async with engine.begin() as conn:
          await conn.run_sync(Base.metadata.create_all)
+         for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
       logger.info("Database tables created successfully")
    except Exception as e:
       logger.error("Failed to create database tables: %s", e, exc_info=True)
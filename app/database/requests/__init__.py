@@ -1,43 +1,86 @@
 from .users_requests import (
-    is_user_registered,
     get_all_users,
     get_user_by_tg_id,
     create_user,
+    get_user_scores,
+    get_user_score,
+    get_profile,
+    UserProfile,
+    get_leaderboard,
+    get_leaderboard_page,
+    LeaderboardRow,
 )
 
 from .events_requests import (
-    visited_events,
     get_event_by_id,
     get_all_events,
+    get_events_between,
+    get_checkin_events,
+    CheckinEvents,
     create_event,
     mark_attendance,
 )
 
 from .tasks_requests import (
    get_tasks_by_date,
-   get_completed_tasks,
    get_current_task,
    get_task_by_id,
-   mark_task_completed,
-   update_user_score,
-   get_tasks_status,
+   submit_task_answer,
+   get_day_plan,
+   DayPlan,
+)
+
+from .broadcast_requests import (
+   get_or_create_broadcast,
+   finish_broadcast,
+   count_pending_recipients,
+   iter_pending_recipients,
+   record_deliveries,
+)
+
+from .jobs_requests import (
+   get_job_last_slot,
+   save_job_slot,
+)
+
+from .media_requests import (
+   get_media_file_id,
+   get_all_media_file_ids,
+   save_media_file_id,
 )
 
 __all__ = [
-   'is_user_registered',
    'get_all_users',
    'get_user_by_tg_id',
    'create_user',
-   'visited_events',
+   'get_user_scores',
+   'get_user_score',
+   'get_profile',
+   'UserProfile',
+   'get_leaderboard',
+   'get_leaderboard_page',
+   'LeaderboardRow',
    'get_event_by_id',
    'get_all_events',
+   'get_events_between',
+   'get_checkin_events',
+   'CheckinEvents',
    'create_event',
    'mark_attendance',
    'get_tasks_by_date',
-   'get_completed_tasks',
    'get_current_task',
    'get_task_by_id',
-   'mark_task_completed',
-   'update_user_score',
-   'get_tasks_status'
+   'submit_task_answer',
+   'get_day_plan',
+   'DayPlan',
+   'get_or_create_broadcast',
+   'finish_broadcast',
+   'count_pending_recipients',
+   'iter_pending_recipients',
+   'record_deliveries',
+   'get_job_last_slot',
+   'save_job_slot',
+   'get_media_file_id',
+   'get_all_media_file_ids',
+   'save_media_file_id'
 ]
@@ -0,0 +1,67 @@
+from datetime import date as date_type
+from typing import AsyncIterator
+
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database.models import Broadcast, BroadcastDelivery, User, async_session
+
+
+async def get_or_create_broadcast(kind: str, day: date_type) -> Broadcast:
+   async with async_session() as session:
+      await session.execute(
+         insert(Broadcast)
+         .values(kind=kind, day=day)
+         .on_conflict_do_nothing(constraint='uq_broadcast_kind_day')
+      )
+      broadcast = await session.scalar(
+         select(Broadcast).where(Broadcast.kind == kind, Broadcast.day == day)
+      )
+      await session.commit()
+      return broadcast
+
+async def finish_broadcast(broadcast_id: int) -> None:
+   async with async_session() as session:
+      await session.execute(
+         update(Broadcast).where(Broadcast.id == broadcast_id).values(finished_at=func.now())
+      )
+      await session.commit()
+
+def _pending_recipients(broadcast_id: int):
+   delivered = exists().where(
+      BroadcastDelivery.broadcast_id == broadcast_id,
+      BroadcastDelivery.user_id == User.id
+   )
+   return select(User.id).where(~delivered)
+
+async def count_pending_recipients(broadcast_id: int) -> int:
+   async with async_session() as session:
+      return await session.scalar(
+         select(func.count()).select_from(_pending_recipients(broadcast_id).subquery())
+      )
+
+async def iter_pending_recipients(broadcast_id: int, batch_size: int) -> AsyncIterator[list[int]]:
+   """Users without a delivery record yet, in batches, read through a server-side cursor."""
+   async with async_session() as session:
+      result = await session.stream_scalars(
+         _pending_recipients(broadcast_id)
+         .order_by(User.id)
+         .execution_options(yield_per=batch_size)
+      )
+      async for batch in result.partitions(batch_size):
+         yield list(batch)
+
+async def record_deliveries(broadcast_id: int, deliveries: list[tuple[int, str, str | None]]) -> None:
+   """Save (user_id, status, error) of a batch of recipients with one insert."""
+   if not deliveries:
+      return
+   async with async_session() as session:
+      await session.execute(
+         insert(BroadcastDelivery)
+         .values([
+            {'broadcast_id': broadcast_id, 'user_id': user_id, 'status': status, 'error': error}
+            for user_id, status, error in deliveries
+         ])
+         .on_conflict_do_nothing()
+      )
+      await session.commit()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.database.models import async_session
+from app.helpers.background import spawn
+
+logger = logging.getLogger(__name__)
+
+# Больше отметок в одном запросе не пишем, даже если окно еще не закончилось
+MAX_BATCH_SIZE = 500
+
+# Все отметки пачки одним запросом: вставка с пропуском повторов и начисление
+# баллов суммой по пользователю. Возвращаются только реально вставленные отметки.
+BATCH_CHECKIN_SQL = text('''
+   WITH input AS (
+      SELECT *
+      FROM unnest(CAST(:user_ids AS bigint[]), CAST(:event_ids AS integer[]), CAST(:points AS integer[]))
+         AS t(user_id, event_id, awarded_points)
+   ),
+   inserted AS (
+      INSERT INTO user_events (user_id, event_id, awarded_points)
+      SELECT user_id, event_id, awarded_points FROM input
+      ON CONFLICT ON CONSTRAINT uq_user_event DO NOTHING
+      RETURNING user_id, event_id, awarded_points
+   ),
+   updated AS (
+      UPDATE users SET score = users.score + totals.points
+      FROM (SELECT user_id, SUM(awarded_points) AS points FROM inserted GROUP BY user_id) AS totals
+      WHERE users.id = totals.user_id
+      RETURNING users.id, users.score
+   )
+   SELECT inserted.user_id, inserted.event_id, updated.score
+   FROM inserted JOIN updated ON updated.id = inserted.user_id
+''')
+
+CheckinKey = tuple[int, int]
+SingleCheckin = Callable[[int, int, int], Awaitable[int | None]]
+
+
+class CheckinCoalescer:
+   """
+   Collects check-ins for `window` seconds and writes them with a single statement.
+   Each caller gets its own result: the new score, or None if already checked in.
+   """
+
+   def __init__(self, window: float, single_checkin: SingleCheckin):
+      self._window = window
+      self._single_checkin = single_checkin
+      self._pending: dict[CheckinKey, tuple[int, asyncio.Future]] = {}
+      self._flush_task: asyncio.Task | None = None
+
+   async def submit(self, user_id: int, event_id: int, awarded_points: int) -> int | None:
+      key = (user_id, event_id)
+      pending = self._pending.get(key)
+      if pending is not None:
+         # Повторное сообщение того же пользователя, пока первое еще в очереди: ждем ту же
+         # запись (ее ошибку получим и здесь), но баллы за нее сообщит только первый
+         await asyncio.shield(pending[1])
+         return None
+
+      future = asyncio.get_running_loop().create_future()
+      self._pending[key] = (awarded_points, future)
+      if len(self._pending) >= MAX_BATCH_SIZE:
+         self._flush_now()
+      elif self._flush_task is None:
+         self._flush_task = asyncio.create_task(self._flush_later())
+      # shield: отмена одного ожидающего не должна отменять результат для остальных
+      return await asyncio.shield(future)
+
+   async def _flush_later(self) -> None:
+      await asyncio.sleep(self._window)
+      self._flush_task = None
+      await self._write(self._take_batch())
+
+   def _flush_now(self) -> None:
+      if self._flush_task is not None:
+         self._flush_task.cancel()
+         self._flush_task = None
+      spawn(self._write(self._take_batch()), name='checkin:flush')
+
+   def _take_batch(self) -> dict[CheckinKey, tuple[int, asyncio.Future]]:
+      batch, self._pending = self._pending, {}
+      return batch
+
+   async def _write(self, batch: dict[CheckinKey, tuple[int, asyncio.Future]]) -> None:
+      if not batch:
+         return
+      try:
+         scores = await self._write_batch(batch)
+      except IntegrityError:
+         # Например, мероприятие удалили - пишем по одной, чтобы ошибку получили только его отметки
+         logger.warning("Batch check-in of %d failed, retrying one by one", len(batch))
+         await asyncio.gather(*(
+            self._write_single(key, points, future) for key, (points, future) in batch.items()
+         ))
+         return
+      except Exception as e:
+         for _, future in batch.values():
+            if not future.done():
+               future.set_exception(e)
+         return
+
+      for key, (_, future) in batch.items():
+         if not future.done():
+            future.set_result(scores.get(key))
+
+   async def _write_batch(self, batch: dict[CheckinKey, tuple[int, asyncio.Future]]) -> dict[CheckinKey, int]:
+      async with async_session() as session:
+         result = await session.execute(BATCH_CHECKIN_SQL, {
+            'user_ids': [user_id for user_id, _ in batch],
+            'event_ids': [event_id for _, event_id in batch],
+            'points': [points for points, _ in batch.values()],
+         })
+         rows = result.all()
+         await session.commit()
+      return {(user_id, event_id): score for user_id, event_id, score in rows}
+
+   async def _write_single(self, key: CheckinKey, points: int, future: asyncio.Future) -> None:
+      try:
+         result = await self._single_checkin(*key, points)
+      except Exception as e:
+         if not future.done():
+            future.set_exception(e)
+      else:
+         if not future.done():
+            future.set_result(result)
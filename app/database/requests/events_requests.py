@@ -1,24 +1,28 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
 from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
+from app.database import invalidation
 from app.database.models import Event, User, UserEvent, async_session
+from app.database.requests.checkin_coalescer import CheckinCoalescer
+from app.helpers.cache import SingleFlightCache
 from app.helpers.snowflake_helper import get_snowflakes_word
+from app.helpers.time_helper import moscow_now
+from config import CHECKIN_COALESCE_MS, CHECKIN_WINDOW_PAST_HOURS, CHECKIN_WINDOW_FUTURE_HOURS
 
-async def visited_events(tg_id: int) -> list[Event]:
-   async with async_session() as session:
-      user = await session.scalar(select(User).where(User.id == tg_id))
-      
-      if not user:
-         return []
+# Как часто пересчитывать окно мероприятий для отметки, даже если их никто не менял (сек)
+CHECKIN_EVENTS_TTL = 300
 
-      events = await session.execute(
-         select(Event)
-         .join(UserEvent, Event.id == UserEvent.event_id)
-         .where(UserEvent.user_id == user.id)
-      )
-      return events.scalars().all()
-      
 async def get_event_by_id(event_id: int) -> Event | None:
+   # Мероприятия из окна отметки уже лежат в памяти
+   event = (await checkin_events_cache.get()).by_id.get(event_id)
+   if event:
+      return event
+
    async with async_session() as session:
       event = await session.scalar(select(Event).where(Event.id == event_id))
       return event
@@ -28,6 +32,57 @@ async def get_all_events() -> list[Event]:
       result = await session.execute(select(Event).order_by(Event.date))
       events = result.scalars().all()
       return events
+
+async def get_events_between(start: datetime, end: datetime) -> list[Event]:
+   async with async_session() as session:
+      result = await session.execute(
+         select(Event).where(Event.date.between(start, end)).order_by(Event.date)
+      )
+      return list(result.scalars().all())
+
+
+@dataclass(frozen=True, slots=True)
+class CheckinEvents:
+   """Events open for check-in: ordered for the keyboard and indexed by id for callbacks."""
+   events: tuple[Event, ...]
+   by_id: dict[int, Event]
+
+class CheckinEventsCache:
+   """
+   Мероприятия в окне вокруг текущего момента, на которые можно отметиться.
+   Окно сдвигается со временем, поэтому кроме события 'events' кэш живет не дольше ttl.
+   """
+
+   def __init__(self, past: timedelta, future: timedelta, ttl: float):
+      self._past = past
+      self._future = future
+      self._ttl = ttl
+      self._cache: SingleFlightCache[str, CheckinEvents] = SingleFlightCache()
+      self._expires_at = 0.0
+
+   async def get(self) -> CheckinEvents:
+      if time.monotonic() >= self._expires_at:
+         self.invalidate()
+      return await self._cache.get('checkin', self._load)
+
+   async def _load(self) -> CheckinEvents:
+      now = moscow_now().replace(tzinfo=None)
+      events = await get_events_between(now - self._past, now + self._future)
+      return CheckinEvents(events=tuple(events), by_id={event.id: event for event in events})
+
+   def invalidate(self, data: dict | None = None) -> None:
+      self._cache.invalidate()
+      self._expires_at = time.monotonic() + self._ttl
+
+checkin_events_cache = CheckinEventsCache(
+   past=timedelta(hours=CHECKIN_WINDOW_PAST_HOURS),
+   future=timedelta(hours=CHECKIN_WINDOW_FUTURE_HOURS),
+   ttl=CHECKIN_EVENTS_TTL,
+)
+invalidation.subscribe('events', checkin_events_cache.invalidate)
+
+async def get_checkin_events() -> CheckinEvents:
+   return await checkin_events_cache.get()
       
 async def create_event(title: str, date: str, score: int, code: str) -> Event:
    async with async_session() as session:
@@ -41,28 +96,58 @@ async def create_event(title: str, date: str, score: int, code: str) -> Event:
 
       await session.commit()
       await session.refresh(event)
+      invalidation.publish('events', event_id=event.id)
 
       return event
    
+async def _insert_attendance(user_id: int, event_id: int, awarded: int) -> int | None:
+   """Returns the user's new score, None if the user is already checked in."""
+   # Отметка и начисление баллов одним запросом: если отметка уже есть, CTE пуст и UPDATE ничего не меняет
+   attendance = (
+      insert(UserEvent)
+      .values(user_id=user_id, event_id=event_id, awarded_points=awarded)
+      .on_conflict_do_nothing(constraint='uq_user_event')
+      .returning(UserEvent.awarded_points)
+      .cte('attendance')
+   )
+   async with async_session() as session:
+      new_score = await session.scalar(
+         update(User)
+         .where(User.id == user_id)
+         .values(score=User.score + attendance.c.awarded_points)
+         .returning(User.score)
+      )
+      await session.commit()
+      return new_score
+
+# В пиковые моменты (все вводят кодовое слово разом) отметки можно писать пачками
+checkin_coalescer = (
+   CheckinCoalescer(CHECKIN_COALESCE_MS / 1000, _insert_attendance)
+   if CHECKIN_COALESCE_MS > 0 else None
+)
+
 async def mark_attendance(user_id: int, event_id: int, codeword: str) -> tuple[bool, str, int]:
    # Returns (success, message, awarded_points)
-   async with async_session() as session:
-      event = await session.scalar(select(Event).where(Event.id == event_id))
-      if not event:
-         return False, "Мероприятие не найдено", 0
-
-      # case-insensitive codeword check
-      if event.code.strip().lower() != codeword.strip().lower():
-         return False, "Неверное кодовое слово", 0
-
-      awarded = event.score
-      userEvent = UserEvent(user_id=user_id, event_id=event_id, awarded_points=awarded)
-      session.add(userEvent)
-
-      try:
-         await session.execute(update(User).where(User.id == user_id).values(score=User.score + awarded))
-         await session.commit()
-         return True, f"Отметка принята, было зачислено +{awarded} {get_snowflakes_word(awarded)}!", awarded
-      except IntegrityError:
-         await session.rollback()
-         return False, "Вы уже отмечены на этом мероприятии!", 0
+   event = await get_event_by_id(event_id)
+   if not event:
+      return False, "Мероприятие не найдено", 0
+
+   # case-insensitive codeword check
+   if event.code.strip().lower() != codeword.strip().lower():
+      return False, "Неверное кодовое слово", 0
+
+   awarded = event.score
+   try:
+      if checkin_coalescer:
+         new_score = await checkin_coalescer.submit(user_id, event_id, awarded)
+      else:
+         new_score = await _insert_attendance(user_id, event_id, awarded)
+   except IntegrityError:
+      # Мероприятие успели удалить, а кэш еще не сбросился
+      return False, "Мероприятие не найдено", 0
+
+   if new_score is None:
+      return False, "Вы уже отмечены на этом мероприятии!", 0
+
+   invalidation.publish('scores', user_id=user_id, score=new_score)
+   return True, f"Отметка принята, было зачислено +{awarded} {get_snowflakes_word(awarded)}!", awarded
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database.models import JobRun, async_session
+
+
+async def get_job_last_slot(name: str) -> datetime | None:
+   async with async_session() as session:
+      return await session.scalar(select(JobRun.last_slot).where(JobRun.name == name))
+
+async def save_job_slot(name: str, slot: datetime) -> None:
+   async with async_session() as session:
+      stmt = insert(JobRun).values(name=name, last_slot=slot)
+      await session.execute(stmt.on_conflict_do_update(
+         index_elements=[JobRun.name],
+         set_={'last_slot': stmt.excluded.last_slot, 'finished_at': func.now()}
+      ))
+      await session.commit()
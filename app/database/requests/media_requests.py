@@ -0,0 +1,35 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database.models import MediaFile, async_session
+
+
+async def get_media_file_id(path: str, content_hash: str) -> str | None:
+   async with async_session() as session:
+      return await session.scalar(
+         select(MediaFile.file_id).where(
+            MediaFile.path == path,
+            MediaFile.content_hash == content_hash
+         )
+      )
+
+async def get_all_media_file_ids() -> dict[tuple[str, str], str]:
+   async with async_session() as session:
+      result = await session.execute(select(MediaFile.path, MediaFile.content_hash, MediaFile.file_id))
+      return {(path, content_hash): file_id for path, content_hash, file_id in result.all()}
+
+async def save_media_file_id(path: str, content_hash: str, file_id: str, size: int) -> None:
+   async with async_session() as session:
+      stmt = insert(MediaFile).values(
+         path=path,
+         content_hash=content_hash,
+         file_id=file_id,
+         size=size
+      )
+      # Устаревший file_id (например, после смены бота) перезаписываем новым
+      stmt = stmt.on_conflict_do_update(
+         constraint='uq_media_path_hash',
+         set_={'file_id': stmt.excluded.file_id, 'size': stmt.excluded.size}
+      )
+      await session.execute(stmt)
+      await session.commit()
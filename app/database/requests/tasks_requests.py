@@ -1,153 +1,149 @@
-from sqlalchemy import select, and_
-from sqlalchemy.exc import IntegrityError
+from dataclasses import dataclass
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime, date as date_type, time
 
-from app.database.models import Task, TaskCompletion, async_session
+from app.database import invalidation
+from app.database.models import Task, TaskCompletion, User, async_session
+from app.helpers.answer_matcher import get_answer_matcher
+from app.helpers.cache import SingleFlightCache
+from app.helpers.time_helper import moscow_now, moscow_today, next_moscow_midnight
 
-async def get_tasks_by_date(task_date: date_type) -> list[Task]:
-    """Get all tasks that are active on a specific date."""
+
+@dataclass(frozen=True, slots=True)
+class DayPlan:
+    """Tasks of a day in order (TF -> AI -> DISH) and which of them the user has completed."""
+    tasks: tuple[Task, ...]
+    completed_ids: frozenset[int]
+
+    @property
+    def all_completed(self) -> bool:
+        return all(task.id in self.completed_ids for task in self.tasks)
+
+    @property
+    def current(self) -> Task | None:
+        """First not completed task, None when all are done."""
+        return self.next_after()
+
+    def next_after(self, *completed_ids: int) -> Task | None:
+        """Current task once the given tasks are completed too (no need to reload the plan)."""
+        for task in self.tasks:
+            if task.id not in self.completed_ids and task.id not in completed_ids:
+                return task
+        return None
+
+    def get_task(self, task_id: int) -> Task | None:
+        for task in self.tasks:
+            if task.id == task_id:
+                return task
+        return None
+
+class DayTasksCache:
+    """
+    Задания дня одинаковы для всех пользователей, поэтому список заданий на дату
+    читаем из БД один раз. В полночь по Москве забываем прошедшие дни (следующий
+    день мог быть загружен заранее и остается), а по событию 'tasks', которое
+    публикует админское API при изменении заданий, - весь кэш.
+    """
+
+    def __init__(self):
+        self._cache: SingleFlightCache[date_type, tuple[Task, ...]] = SingleFlightCache()
+        self._expires_at = next_moscow_midnight()
+
+    async def get(self, task_date: date_type) -> tuple[Task, ...]:
+        if moscow_now() >= self._expires_at:
+            self._forget_past_days()
+        return await self._cache.get(task_date, lambda: _load_tasks_by_date(task_date))
+
+    def _forget_past_days(self) -> None:
+        today = moscow_today()
+        for task_date in self._cache.keys():
+            if task_date < today:
+                self._cache.discard(task_date)
+        self._expires_at = next_moscow_midnight()
+
+    def invalidate(self, data: dict | None = None) -> None:
+        self._cache.invalidate()
+        self._expires_at = next_moscow_midnight()
+
+day_tasks_cache = DayTasksCache()
+invalidation.subscribe('tasks', day_tasks_cache.invalidate)
+
+async def _load_tasks_by_date(task_date: date_type) -> tuple[Task, ...]:
     async with async_session() as session:
         day_start = datetime.combine(task_date, time.min)
         day_end = datetime.combine(task_date, time.max)
-        
+
         result = await session.execute(
             select(Task).where(
                 Task.date_start <= day_end,
                 Task.date_end >= day_start
-            ).order_by(Task.type)  # Порядок: TF, AI, DISH (по алфавиту enum)
+            ).order_by(Task.type, Task.id)  # Порядок: TF, AI, DISH (как в enum)
         )
-        return result.scalars().all()
+        tasks = tuple(result.scalars().all())
+
+    # Матчеры ответов готовим сразу, а не на первом ответе пользователя
+    for task in tasks:
+        get_answer_matcher(task)
+    return tasks
+
+async def get_day_plan(user_id: int, task_date: date_type) -> DayPlan:
+    """Tasks for the day (cached) with the user's completion flags."""
+    tasks = await day_tasks_cache.get(task_date)
+    if not tasks:
+        return DayPlan(tasks=tasks, completed_ids=frozenset())
 
-async def get_completed_tasks(user_id: int, task_date: date_type) -> list[Task]:
-    """Get tasks that a user has completed on a specific date."""
     async with async_session() as session:
-        day_start = datetime.combine(task_date, time.min)
-        day_end = datetime.combine(task_date, time.max)
-        
-        result = await session.execute(
-            select(Task)
-            .join(TaskCompletion, Task.id == TaskCompletion.task_id)
-            .where(TaskCompletion.user_id == user_id)
-            .where(Task.date_start <= day_end, Task.date_end >= day_start)
-            .order_by(Task.type)
+        completed = await session.scalars(
+            select(TaskCompletion.task_id).where(
+                TaskCompletion.user_id == user_id,
+                TaskCompletion.task_id.in_([task.id for task in tasks])
+            )
         )
-        return list(result.scalars().all())
+        return DayPlan(tasks=tasks, completed_ids=frozenset(completed.all()))
+
+async def get_tasks_by_date(task_date: date_type) -> list[Task]:
+    """Get all tasks that are active on a specific date."""
+    return list(await day_tasks_cache.get(task_date))
 
 async def get_current_task(user_id: int, task_date: date_type) -> Task | None:
     """Get the current task for user (first not completed task for today in order: TF -> AI -> DISH)."""
-    async with async_session() as session:
-        day_start = datetime.combine(task_date, time.min)
-        day_end = datetime.combine(task_date, time.max)
-        
-        # Get all tasks for today in correct order
-        all_tasks = await session.execute(
-            select(Task).where(
-                Task.date_start <= day_end,
-                Task.date_end >= day_start
-            ).order_by(Task.type)  # TF, AI, DISH
-        )
-        all_tasks = list(all_tasks.scalars().all())
-        
-        # Get completed tasks for today
-        completed_tasks = await session.execute(
-            select(TaskCompletion.task_id)
-            .join(Task, Task.id == TaskCompletion.task_id)
-            .where(TaskCompletion.user_id == user_id)
-            .where(Task.date_start <= day_end, Task.date_end >= day_start)
-        )
-        completed_task_ids = set(completed_tasks.scalars().all())
-        
-        # Find first not completed task in order
-        for task in all_tasks:
-            if task.id not in completed_task_ids:
-                return task
-        
-        return None  # All tasks completed
+    plan = await get_day_plan(user_id, task_date)
+    return plan.current
 
 async def get_task_by_id(task_id: int) -> Task | None:
     async with async_session() as session:
         return await session.scalar(select(Task).where(Task.id == task_id))
 
-async def mark_task_completed(user_id: int, task_id: int, awarded_points: int, user_answer: str) -> bool:
-    """Mark task as completed. Returns True if successful, False if already completed."""
-    async with async_session() as session:
-        # Check if already completed
-        existing = await session.scalar(
-            select(TaskCompletion).where(
-                TaskCompletion.user_id == user_id,
-                TaskCompletion.task_id == task_id
-            )
-        )
-        
-        if existing:
-            return False  # Already completed
-        
-        completion = TaskCompletion(
+async def submit_task_answer(user_id: int, task_id: int, awarded_points: int, user_answer: str) -> int | None:
+    """
+    Record the answer and add the points in one statement.
+    Returns the user's new score, or None if the task was already completed.
+    """
+    completion = (
+        insert(TaskCompletion)
+        .values(
             user_id=user_id,
             task_id=task_id,
             awarded_points=awarded_points,
             user_answer=user_answer,
             timestamp=datetime.utcnow()
         )
-        session.add(completion)
-        try:
-            await session.commit()
-            return True
-        except IntegrityError:
-            await session.rollback()
-            return False
-
-async def update_user_score(user_id: int, points_to_add: int) -> None:
-    """Update user's total score."""
-    from app.database.models import User
+        .on_conflict_do_nothing(constraint='uq_user_task')
+        .returning(TaskCompletion.awarded_points)
+        .cte('completion')
+    )
+    # Баллы начисляются только если вставка прошла: без строки в CTE UPDATE ничего не найдет
     async with async_session() as session:
-        user = await session.get(User, user_id)
-        if user:
-            user.score += points_to_add
-            await session.commit()
-
-async def get_tasks_status(user_id: int, task_date: date_type) -> dict:
-    """Get status of all tasks for today with completion info."""
-    async with async_session() as session:
-        day_start = datetime.combine(task_date, time.min)
-        day_end = datetime.combine(task_date, time.max)
-        
-        # Get all tasks for today in order
-        all_tasks_result = await session.execute(
-            select(Task).where(
-                Task.date_start <= day_end,
-                Task.date_end >= day_start
-            ).order_by(Task.type)
-        )
-        all_tasks = list(all_tasks_result.scalars().all())
-        
-        # Get completed task IDs
-        completed_result = await session.execute(
-            select(TaskCompletion.task_id)
-            .join(Task, Task.id == TaskCompletion.task_id)
-            .where(TaskCompletion.user_id == user_id)
-            .where(Task.date_start <= day_end, Task.date_end >= day_start)
+        new_score = await session.scalar(
+            update(User)
+            .where(User.id == user_id)
+            .values(score=User.score + completion.c.awarded_points)
+            .returning(User.score)
         )
-        completed_ids = set(completed_result.scalars().all())
-        
-        # Build status
-        task_types_order = ['TF', 'AI', 'DISH']
-        status = {}
-        
-        for task_type in task_types_order:
-            tasks_of_type = [t for t in all_tasks if t.type == task_type]
-            if tasks_of_type:
-                task = tasks_of_type[0]  # Assuming one task per type per day
-                status[task_type] = {
-                    'task': task,
-                    'completed': task.id in completed_ids,
-                    'current': False
-                }
-        
-        # Mark current task (first not completed)
-        for task_type in task_types_order:
-            if task_type in status and not status[task_type]['completed']:
-                status[task_type]['current'] = True
-                break
-        
-        return status
\ No newline at end of file
+        await session.commit()
+
+    if new_score is not None:
+        invalidation.publish('scores', user_id=user_id, score=new_score)
+    return new_score
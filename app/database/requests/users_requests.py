@@ -1,13 +1,33 @@
-from sqlalchemy import select
+from dataclasses import dataclass
+
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.types import BigInteger
 
-from app.database.models import User, async_session
+from app.database import invalidation
+from app.database.models import TaskCompletion, User, UserEvent, async_session
 
 
-async def is_user_registered(tg_id: BigInteger) -> bool:
-   async with async_session() as session:
-      user = await session.scalar(select(User).where(User.id == tg_id))
-      return user is not None
+@dataclass(frozen=True, slots=True)
+class LeaderboardRow:
+   id: int
+   first_name: str
+   last_name: str
+   score: int
+   rank: int
+
+   @property
+   def full_name(self) -> str:
+      return f"{self.first_name} {self.last_name}".strip()
+
+@dataclass(frozen=True, slots=True)
+class UserProfile:
+   id: int
+   first_name: str
+   last_name: str
+   score: int
+   visited_events: int
+   completed_tasks: int
+
 
 async def get_all_users() -> list[User]:
    async with async_session() as session:
@@ -34,5 +54,110 @@ async def create_user(tg_id: BigInteger, firstName: str, lastName: str) -> User
 
          await session.commit()
          await session.refresh(user)
+         invalidation.publish(
+            'users',
+            user_id=user.id,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            score=user.score
+         )
 
       return user
+
+async def get_user_scores() -> list[tuple[int, int]]:
+   async with async_session() as session:
+      result = await session.execute(select(User.id, User.score))
+      return [tuple(row) for row in result.all()]
+
+async def get_user_score(tg_id: BigInteger) -> int | None:
+   async with async_session() as session:
+      return await session.scalar(select(User.score).where(User.id == tg_id))
+
+async def get_profile(tg_id: BigInteger) -> UserProfile | None:
+   """Everything /profile reads from the database, in one statement with count subqueries."""
+   visited_events = (
+      select(func.count())
+      .where(UserEvent.user_id == User.id)
+      .scalar_subquery()
+   )
+   completed_tasks = (
+      select(func.count())
+      .where(TaskCompletion.user_id == User.id)
+      .scalar_subquery()
+   )
+   async with async_session() as session:
+      result = await session.execute(
+         select(
+            User.id,
+            User.first_name,
+            User.last_name,
+            User.score,
+            visited_events,
+            completed_tasks,
+         ).where(User.id == tg_id)
+      )
+      row = result.first()
+      return UserProfile(*row) if row else None
+
+async def get_leaderboard(limit: int) -> list[LeaderboardRow]:
+   """Top `limit` users by score with their dense rank, read through ix_users_score_id."""
+   rank = func.dense_rank().over(order_by=User.score.desc()).label('rank')
+   async with async_session() as session:
+      result = await session.execute(
+         select(User.id, User.first_name, User.last_name, User.score, rank)
+         .order_by(User.score.desc(), User.id.desc())
+         .limit(limit)
+      )
+      return [LeaderboardRow(*row) for row in result.all()]
+
+async def get_leaderboard_page(
+   limit: int,
+   after: tuple[int, int] | None = None,
+   before: tuple[int, int] | None = None,
+) -> tuple[list[LeaderboardRow], bool]:
+   """
+   One leaderboard page by keyset on (score, id): the `limit` users right after
+   or right before the given (score, id) cursor in (score DESC, id DESC) order.
+   Returns the rows and whether there are more rows further in that direction.
+   """
+   cursor = after or before
+   if cursor is None:
+      rows = await get_leaderboard(limit + 1)
+      return rows[:limit], len(rows) > limit
+
+   cursor_score, cursor_id = cursor
+   # Плотный ранг курсора: число различных баллов выше него + 1
+   higher_scores = (
+      select(func.count(User.score.distinct()))
+      .where(User.score > cursor_score)
+      .scalar_subquery()
+   )
+   stmt = select(User.id, User.first_name, User.last_name, User.score, higher_scores)
+   if after:
+      stmt = stmt.where(tuple_(User.score, User.id) < cursor).order_by(User.score.desc(), User.id.desc())
+   else:
+      stmt = stmt.where(tuple_(User.score, User.id) > cursor).order_by(User.score.asc(), User.id.asc())
+
+   async with async_session() as session:
+      result = await session.execute(stmt.limit(limit + 1))
+      fetched = result.all()
+
+   has_more = len(fetched) > limit
+   fetched = fetched[:limit]
+   if not fetched:
+      return [], False
+
+   # Ранги считаем от курсора: каждый новый балл сдвигает место на единицу
+   rank = fetched[0][4] + 1
+   step = 1 if after else -1
+   previous_score = cursor_score
+   rows = []
+   for user_id, first_name, last_name, score, _ in fetched:
+      if score != previous_score:
+         rank += step
+         previous_score = score
+      rows.append(LeaderboardRow(user_id, first_name, last_name, score, rank))
+
+   if before:
+      rows.reverse()
+   return rows, has_more
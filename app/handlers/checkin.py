@@ -1,8 +1,10 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 
+from app.database.models import User
+
 import app.keyboards as keyboards
 import app.database.requests as db_requests
 import app.states.checkin_state as checkinState
@@ -11,11 +13,18 @@ import textwrap
 
 router = Router()
 
-@router.message(Command('checkin'))
-async def handler_checkin(message: Message):
-   is_user_registered = await db_requests.is_user_registered(message.from_user.id)
+# Клавиатура мероприятий одна на всех; пересобираем, только когда сменился набор мероприятий
+_checkin_keyboard: tuple[db_requests.CheckinEvents, InlineKeyboardMarkup] | None = None
+
+def get_checkin_keyboard(checkin: db_requests.CheckinEvents) -> InlineKeyboardMarkup:
+   global _checkin_keyboard
+   if _checkin_keyboard is None or _checkin_keyboard[0] is not checkin:
+      _checkin_keyboard = (checkin, keyboards.create_events_keyboard(list(checkin.events)))
+   return _checkin_keyboard[1]
 
-   if not is_user_registered:
+@router.message(Command('checkin'))
+async def handler_checkin(message: Message, user: User | None):
+   if not user:
       text = textwrap.dedent(
       '''
          Ты еще не зарегистрирован!
@@ -26,13 +35,13 @@ async def handler_checkin(message: Message):
       await message.answer(text)
       return
    
-   events = await db_requests.get_all_events()
+   checkin = await db_requests.get_checkin_events()
 
-   if not events:
+   if not checkin.events:
       await message.answer('❄️ В предновогодней тишине...')
       return
 
-   events_keyboard = keyboards.create_events_keyboard(events)
+   events_keyboard = get_checkin_keyboard(checkin)
 
    text = textwrap.dedent('📅 Выбери мероприятие, на котором хочешь отметиться:')
    await message.answer(text, reply_markup=events_keyboard)
@@ -42,7 +51,7 @@ async def handler_checkin(message: Message):
 async def callback_select_event(callback: CallbackQuery, state: FSMContext):
    await callback.message.delete_reply_markup()  # или edit to avoid duplicate KBs
    event_id = int(callback.data.split(":", 1)[1])
-   event = await db_requests.get_event_by_id(event_id)
+   event = (await db_requests.get_checkin_events()).by_id.get(event_id)
 
    if not event:
       await callback.message.answer("Мероприятие не найдено.")
@@ -66,7 +75,7 @@ async def callback_select_event(callback: CallbackQuery, state: FSMContext):
    await state.set_state(checkinState.checkinState.waiting_for_event_code)
 
 @router.message(checkinState.checkinState.waiting_for_event_code)
-async def handler_event_code(message: Message, state: FSMContext):
+async def handler_event_code(message: Message, state: FSMContext, user: User | None):
    data = await state.get_data()
    event_id = data.get("event_id")
 
@@ -75,8 +84,6 @@ async def handler_event_code(message: Message, state: FSMContext):
       await state.clear()
       return
 
-   tg_id = message.from_user.id
-   user = await db_requests.get_user_by_tg_id(tg_id)
    if not user:
       await message.answer("Вы не зарегистрированы. Пожалуйста, выполните /start для регистрации.")
       await state.clear()
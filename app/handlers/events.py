@@ -1,18 +1,18 @@
 from aiogram import Router
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message
 from aiogram.filters import Command
+from datetime import datetime
 
-import app.database.requests as db_requests
+from app.database.models import User
+from app.media import answer_media, media_catalog
 
 import textwrap
 
 router = Router()
 
 @router.message(Command('events'))
-async def handler_events(message: Message):
-   is_user_registered = await db_requests.is_user_registered(message.from_user.id)
-
-   if not is_user_registered:
+async def handler_events(message: Message, user: User | None):
+   if not user:
       text = textwrap.dedent(
       '''
          Ты еще не зарегистрирован!
@@ -23,5 +23,12 @@ async def handler_events(message: Message):
       await message.answer(text)
       return
 
-   file = FSInputFile('public/schedule/photo_schedule_2025-12.jpg')
-   await message.answer_photo(photo=file)
\ No newline at end of file
+   # Расписание текущего месяца, а до его появления - последнее загруженное
+   today = datetime.now().date()
+   entry = await media_catalog.get('schedule', today) or media_catalog.latest('schedule')
+
+   if not entry:
+      await message.answer('❄️ Расписание еще готовится...')
+      return
+
+   await answer_media(message, entry)
\ No newline at end of file
@@ -2,17 +2,15 @@ from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import Command
 
-import app.database.requests as db_requests
+from app.database.models import User
 
 import textwrap
 
 router = Router()
 
 @router.message(Command('help'))
-async def handler_help(message: Message):
-   is_user_registered = await db_requests.is_user_registered(message.from_user.id)
-
-   if not is_user_registered:
+async def handler_help(message: Message, user: User | None):
+   if not user:
       text = textwrap.dedent(
       '''
          Ты еще не зарегистрирован!
@@ -1,19 +1,22 @@
 from aiogram import Router
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message
 from aiogram.filters import Command
 from datetime import datetime
 
-import app.database.requests as db_requests
+from app.database.models import User
+from app.media import answer_media
+from app.rollover import day_rollover
 
+import logging
 import textwrap
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 
 @router.message(Command('message'))
-async def handler_message(message: Message):
-   is_user_registered = await db_requests.is_user_registered(message.from_user.id)
-
-   if not is_user_registered:
+async def handler_message(message: Message, user: User | None):
+   if not user:
       text = textwrap.dedent(
       '''
          Ты еще не зарегистрирован!
@@ -24,13 +27,15 @@ async def handler_message(message: Message):
       await message.answer(text)
       return
 
-   try:
-      today = datetime.now().date()
-
-      date_str = today.strftime('%Y-%m-%d')
+   today = datetime.now().date()
+   entry = await day_rollover.message_entry(today)
 
-      file = FSInputFile(f'public/message/photo_message_{date_str}.jpg')
+   if not entry:
+      await message.answer('Ой, послание затерялось... Обратись к Деду Морозу!')
+      return
 
-      await message.answer_photo(photo=file)
-   except:
+   try:
+      await answer_media(message, entry)
+   except Exception as e:
+      logger.error("Failed to send message photo %s: %s", entry.path, e, exc_info=True)
       await message.answer('Ой, послание затерялось... Обратись к Деду Морозу!')
\ No newline at end of file
@@ -3,22 +3,17 @@ from aiogram.types import Message
 from aiogram.filters import Command
 
 import app.database.requests as db_requests
+from app.database.models import User
+from app.helpers.rank_index import rank_index
+from app.helpers.snowflake_helper import get_snowflakes_word
 
 import textwrap
 
 router = Router()
 
 @router.message(Command('profile'))
-async def handler_profile(message: Message):
-   try:
-      is_user_registered = await db_requests.is_user_registered(message.from_user.id)
-   except Exception as e:
-      import logging
-      logging.getLogger(__name__).error("Database error in profile handler: %s", e, exc_info=True)
-      await message.answer("❌ Произошла ошибка при обращении к базе данных. Попробуйте позже.")
-      return
-
-   if not is_user_registered:
+async def handler_profile(message: Message, user: User | None):
+   if not user:
       text = textwrap.dedent(
       '''
          Ты еще не зарегистрирован!
@@ -29,17 +24,30 @@ async def handler_profile(message: Message):
       await message.answer(text)
       return
    
-   user = await db_requests.get_user_by_tg_id(message.from_user.id)
-   visited_events = await db_requests.visited_events(message.from_user.id)
+   profile = await db_requests.get_profile(user.id)
+   if not profile:
+      await message.answer("Профиль не найден. Попробуй /start")
+      return
 
    text = textwrap.dedent(f'''
       <b>🎅 Ваш новогодний профиль:</b>
                           
-      👤 {user.first_name} {user.last_name}
+      👤 {profile.first_name} {profile.last_name}
       📊 Статус: Боец 🧤
 
-      💰 Волшебных снежинок собрано: {user.score}
+      💰 Волшебных снежинок собрано: {profile.score}
 
-      📈 Мероприятий посещено: {len(visited_events)}
+      📈 Мероприятий посещено: {profile.visited_events}
+      ✅ Заданий выполнено: {profile.completed_tasks}
    ''')
+
+   # Место и отставание от следующего места - по индексу в памяти, без прохода по всей таблице
+   rank = rank_index.rank(user.id)
+   if rank is not None:
+      text += f"\n🏆 Место в рейтинге: {rank}"
+      next_score = rank_index.next_score(user.id)
+      if next_score is not None:
+         gap = next_score - rank_index.score(user.id)
+         text += f"\n⬆️ До следующего места: {gap} {get_snowflakes_word(gap)}"
+
    await message.answer(text, parse_mode='HTML')
\ No newline at end of file
@@ -8,6 +8,7 @@ from config import REGISTER_CODE
 import app.keyboards as keyboards
 import app.states.register_state as registerState
 import app.database.requests as db_requests
+from app.database.models import User
 
 import textwrap
 
@@ -15,17 +16,9 @@ router = Router()
 
 
 @router.message(CommandStart())
-async def handler_start(message: Message, state: FSMContext):
-   try:
-      is_user_registered = await db_requests.is_user_registered(message.from_user.id)
-   except Exception as e:
-      import logging
-      logging.getLogger(__name__).error("Database error in start handler: %s", e, exc_info=True)
-      await message.answer("❌ Произошла ошибка при обращении к базе данных. Попробуйте позже.")
-      return
-
+async def handler_start(message: Message, state: FSMContext, user: User | None):
    # Если пользователь зарегистрирован
-   if is_user_registered:
+   if user:
       await message.answer(textwrap.dedent(
       '''
          Ты уже зарегистрирован!
@@ -1,26 +1,31 @@
-from aiogram import Router
-from aiogram.types import Message
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.filters import Command
+from aiogram.exceptions import TelegramBadRequest
 
+from app.database import invalidation
+from app.database.models import User
+from app.helpers.cache import SingleFlightCache
 from app.helpers.snowflake_helper import get_snowflakes_word
 
+import app.keyboards as keyboards
 import app.database.requests as db_requests
 
 import textwrap
 
 router = Router()
 
-@router.message(Command('stats'))
-async def handler_stats(message: Message):
-   try:
-      is_user_registered = await db_requests.is_user_registered(message.from_user.id)
-   except Exception as e:
-      import logging
-      logging.getLogger(__name__).error("Database error in stats handler: %s", e, exc_info=True)
-      await message.answer("❌ Произошла ошибка при обращении к базе данных. Попробуйте позже.")
-      return
+# Сколько участников показывать на одной странице /stats
+LEADERBOARD_PAGE_SIZE = 20
+
+# Готовые страницы рейтинга по курсору; пересобираются только после изменения баллов или участников
+leaderboard_cache: SingleFlightCache[tuple, tuple[str, InlineKeyboardMarkup | None]] = SingleFlightCache()
+invalidation.subscribe('scores', lambda _: leaderboard_cache.invalidate())
+invalidation.subscribe('users', lambda _: leaderboard_cache.invalidate())
 
-   if not is_user_registered:
+@router.message(Command('stats'))
+async def handler_stats(message: Message, user: User | None):
+   if not user:
       text = textwrap.dedent(
       '''
          Ты еще не зарегистрирован!
@@ -31,29 +36,55 @@ async def handler_stats(message: Message):
       await message.answer(text)
       return
    
-   users = (await db_requests.get_all_users())
-   sorted_users = sorted(users, key=lambda user: user.score, reverse=True)
+   text, keyboard = await get_leaderboard_page(None, None)
+   await message.answer(text, parse_mode='HTML', reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("stats:"))
+async def callback_stats_page(callback: CallbackQuery):
+   _, direction, score, user_id = callback.data.split(":")
+   cursor = (int(score), int(user_id))
+
+   text, keyboard = await get_leaderboard_page(direction, cursor)
+
+   # Листаем в том же сообщении, а не присылаем новое
+   try:
+      await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard)
+   except TelegramBadRequest:
+      # Страница не изменилась (двойное нажатие) - редактировать нечего
+      pass
+   await callback.answer()
+
+async def get_leaderboard_page(direction: str | None, cursor: tuple[int, int] | None):
+   return await leaderboard_cache.get(
+      (direction, cursor),
+      lambda: render_leaderboard_page(direction, cursor)
+   )
+
+async def render_leaderboard_page(direction: str | None, cursor: tuple[int, int] | None):
+   rows, has_more = await db_requests.get_leaderboard_page(
+      LEADERBOARD_PAGE_SIZE,
+      after=cursor if direction == 'next' else None,
+      before=cursor if direction == 'prev' else None,
+   )
 
    # Определяем эмодзи для первых трех мест
    medals = {
-      0: '🥇',
-      1: '🥈', 
-      2: '🥉'
+      1: '🥇',
+      2: '🥈', 
+      3: '🥉'
    }
 
    # Формируем текст топа
    top_lines = []
-   for i, user in enumerate(sorted_users):
-      # Формируем полное имя
-      full_name = f"{user.first_name} {user.last_name}".strip()
-      
+   for row in rows:
       # Добавляем эмодзи для первых трех мест, для остальных - номер
-      if i in medals:
-         prefix = f"{medals[i]} {full_name}"
+      if row.rank in medals:
+         prefix = f"{medals[row.rank]} {row.full_name}"
       else:
-         prefix = f"{i+1}. {full_name}"
+         prefix = f"{row.rank}. {row.full_name}"
       
-      score = user.score
+      score = row.score
       
       line = f"{prefix} — {score} {get_snowflakes_word(score)}"
       top_lines.append(line)
@@ -65,4 +96,13 @@ async def handler_stats(message: Message):
    header = "🏆 ТОП УЧАСТНИКОВ\n\n"
    text = f"{header}{top_text}"
 
-   await message.answer(text, parse_mode='HTML')
\ No newline at end of file
+   if not rows:
+      return text, None
+
+   # Кнопки назад/вперед: в сторону запроса - если есть еще строки, в обратную - если пришли по курсору
+   first, last = (rows[0].score, rows[0].id), (rows[-1].score, rows[-1].id)
+   if direction == 'prev':
+      keyboard = keyboards.create_stats_keyboard(first if has_more else None, last)
+   else:
+      keyboard = keyboards.create_stats_keyboard(first if cursor else None, last if has_more else None)
+   return text, keyboard
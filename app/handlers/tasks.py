@@ -1,27 +1,30 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
 from datetime import datetime
 
-from app.database.models import Task
+from app.database.models import Task, User
 from app.database.requests import (
-   is_user_registered,
    get_task_by_id,
-   get_current_task, 
-   mark_task_completed, 
-   update_user_score,
-   get_tasks_status
+   get_day_plan,
+   submit_task_answer
 )
+from app.helpers.answer_matcher import get_answer_matcher
+from app.media import answer_media
+from app.rollover import day_rollover
+from app.states.tasks_state import DailyTasksState
 
+import logging
 import textwrap
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 
 @router.message(Command("task"))
-async def handler_task(message: Message):
-   is_user_registered_ = await is_user_registered(message.from_user.id)
-
-   if not is_user_registered_:
+async def handler_task(message: Message, state: FSMContext, user: User | None):
+   if not user:
       text = textwrap.dedent(
       '''
          Ты еще не зарегистрирован!
@@ -36,97 +39,72 @@ async def handler_task(message: Message):
    user_id = message.from_user.id
    today = datetime.now().date()
    
-   tasks_status = await get_tasks_status(user_id, today)
+   plan = await get_day_plan(user_id, today)
     
-   if not tasks_status:
+   if not plan.tasks:
       await message.answer("На сегодня заданий нет!")
       return
     
-   all_completed = all(status['completed'] for status in tasks_status.values())
-   if all_completed:
+   if plan.all_completed:
+      await state.clear()
       await message.answer("🎉 Поздравляем! Вы выполнили все задания на сегодня!")
       return
     
-   current_task = await get_current_task(user_id, today)
+   current_task = plan.current
    if current_task:
-      await send_task_message(message, current_task)
+      await send_task_message(message, current_task, state)
    else:
       await message.answer("❌ Ошибка: не удалось найти текущее задание")
 
-async def send_task_message(message: Message, task: Task):
-   if task.type == 'TF':
-      from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-      
-      keyboard = InlineKeyboardMarkup(
-         inline_keyboard=[
-               [
-                  InlineKeyboardButton(text="✅ Правда", callback_data=f"tf_{task.id}_True"),
-                  InlineKeyboardButton(text="❌ Ложь", callback_data=f"tf_{task.id}_False")
-               ]
-         ]
-      )
-        
-      await message.answer(textwrap.dedent(f'''
-         1️⃣ Задание 1/3: <b>Новый год в разных странах</b>. Правда vs Ложь
-                                           
-         {task.description}
+# Какого ответа ждем от пользователя - по состоянию FSM понятно без запроса к БД
+TASK_STATES = {
+   'TF': DailyTasksState.waiting_for_tf_answer,
+   'AI': DailyTasksState.waiting_for_ai_answer,
+   'DISH': DailyTasksState.waiting_for_dish_answer,
+}
 
-         Выберите правильный ответ:
-      '''), parse_mode='HTML', reply_markup=keyboard)
+async def send_task_message(message: Message, task: Task, state: FSMContext):
+   await state.set_state(TASK_STATES[task.type])
+   await state.set_data({'task_id': task.id})
+
+   # Текст, клавиатура и картинка задания обычно уже собраны заранее (см. app.rollover)
+   view = await day_rollover.task_view(task, datetime.now().date())
+
+   if task.type == 'TF':
+      await message.answer(view.text, parse_mode='HTML', reply_markup=view.keyboard)
         
    elif task.type == 'AI':
+      if not view.media:
+         await message.answer('Ой, задание 2️⃣ затерялось... Обратись к Деду Морозу!')
+         return
+
       try:
-         today = datetime.now().date()
-
-         date_str = today.strftime('%Y-%m-%d')
-
-         file = FSInputFile(f'public/ai_images/photo_ai_image_{date_str}.jpg')
-         
-         await message.answer_photo(photo=file, caption=textwrap.dedent(f'''
-            2️⃣ Задание 2/3: <b>Напишите название новогоднего фильма/мультфильма</b>, к которому представлена эта ИИ-афиша. 
-                                                                        
-            Пишите ответ без кавычек и с большой буквы. 
-            Например: Кислород.
-                                                                        
-            ✨ Название пишем полностью, как в оригинальном названии фильма;
-            ✨ Буквы «Е» и «Ё» равноправны и не влияют на ответ; 
-            ✨ Если в названии есть имена собственные, пишем их с большой буквы; 
-            ✨ Если это серия фильмов, то давать указание на часть не нужно: 
-
-            ✅ Чебурашка 
-            ❌ Чебурашка 2
-            
-            🎬 Напишите название фильма в ответном сообщении.
-         '''), parse_mode='HTML')
-      except:
+         await answer_media(message, view.media, caption=view.text, parse_mode='HTML')
+      except Exception as e:
+         logger.error("Failed to send AI task photo %s: %s", view.media.path, e, exc_info=True)
          await message.answer('Ой, задание 2️⃣ затерялось... Обратись к Деду Морозу!')
         
    elif task.type == 'DISH':
+      if not view.media:
+         await message.answer('Ой, задание 3️⃣ затерялось... Обратись к Деду Морозу!')
+         return
+
       try:
-         today = datetime.now().date()
-         date_str = today.strftime('%Y-%m-%d')
-         file = FSInputFile(f'public/dish_images/photo_dish_image_{date_str}.jpg')
-
-         description_part = f"\nОписание: {task.description}\n" if task.description else ""
-
-         await message.answer_photo(photo=file, caption=
-            f'3️⃣ Задание 3/3: <b>Угадай название салата на праздничный стол</b> 🥗\n'
-            f'{description_part}\n'
-            f'✨ Если вы не знаете, что это за салат, придумайте ему своё оригинальное название\n'
-            f'✨ Баллы за это задание начисляются всем!\n' 
-            f'✨ Креативьте друзья, давайте посмеёмся 🤗',
-         parse_mode='HTML')
-      except:
+         await answer_media(message, view.media, caption=view.text, parse_mode='HTML')
+      except Exception as e:
+         logger.error("Failed to send DISH task photo %s: %s", view.media.path, e, exc_info=True)
          await message.answer('Ой, задание 3️⃣ затерялось... Обратись к Деду Морозу!')
 
 @router.callback_query(F.data.startswith("tf_"))
-async def handle_tf_answer(callback: CallbackQuery):
+async def handle_tf_answer(callback: CallbackQuery, state: FSMContext):
    user_id = callback.from_user.id
    _, task_id, answer = callback.data.split("_")
    task_id = int(task_id)
    today = datetime.now().date()
     
-   task = await get_task_by_id(task_id)
+   plan = await get_day_plan(user_id, today)
+   # Кнопка могла остаться от задания прошлого дня
+   task = plan.get_task(task_id) or await get_task_by_id(task_id)
 
    if not task:
       await callback.answer("Задание не найдено!", show_alert=True)
@@ -135,10 +113,10 @@ async def handle_tf_answer(callback: CallbackQuery):
    is_correct = (answer == task.correct_answer)
    points = task.score if is_correct else 0
     
-   success = await mark_task_completed(user_id, task_id, points, answer)
-    
-   if success and points > 0:
-      await update_user_score(user_id, points)
+   if await submit_task_answer(user_id, task_id, points, answer) is None:
+      # Повторное нажатие: баллы уже начислены, следующее задание уже отправлено
+      await callback.answer("Вы уже ответили на это задание")
+      return
     
    result_text = (
       f"✅ Правильно! Было зачислено +{points} баллов!\n" 
@@ -152,29 +130,33 @@ async def handle_tf_answer(callback: CallbackQuery):
       f"{callback.message.text}\n\n{result_text}"
    )
    
-   next_task = await get_current_task(user_id, today)
+   next_task = plan.next_after(task_id)
    
    if next_task:
-      await send_task_message(callback.message, next_task)
+      await send_task_message(callback.message, next_task, state)
    else:
+      await state.clear()
       await callback.message.answer("🎉 Поздравляем! Вы выполнили все задания на сегодня!")
 
-@router.message(F.text)
-async def handle_text_answer(message: Message):
+@router.message(DailyTasksState.waiting_for_ai_answer, F.text)
+@router.message(DailyTasksState.waiting_for_dish_answer, F.text)
+async def handle_text_answer(message: Message, state: FSMContext):
    user_id = message.from_user.id
    today = datetime.now().date()
-   user_answer = message.text.strip().translate(str.maketrans('ёЁ—', 'еЕ-'))
-    
-   current_task = await get_current_task(user_id, today)
-    
-   if not current_task or current_task.type not in ['AI', 'DISH']:
+   user_answer = message.text.strip()
+
+   data = await state.get_data()
+   plan = await get_day_plan(user_id, today)
+   # Ответ принимаем только на задание сегодняшнего дня: состояние FSM хранится сколько угодно долго
+   task = plan.get_task(data.get('task_id'))
+
+   if not task or task.type not in ['AI', 'DISH']:
+      await state.clear()
+      await message.answer("⌛ Время этого задания истекло. Актуальное задание - по команде /task")
       return
     
-   task = current_task
-    
    if task.type == 'AI':
-      normalized_task_answer = task.correct_answer.strip().translate(str.maketrans('ёЁ—', 'еЕ-'))
-      is_correct = (user_answer.lower() == normalized_task_answer.lower())
+      is_correct = get_answer_matcher(task).matches(user_answer)
       points = task.score if is_correct else 0
       
       result_text = (
@@ -187,16 +169,16 @@ async def handle_text_answer(message: Message):
       points = task.score
       result_text = f"✅ Хм... Интересное название для салата. Ответ принят! Было зачислено +{points} баллов"
 
-   success = await mark_task_completed(user_id, task.id, points, user_answer)
-   
-   if success and points > 0:
-      await update_user_score(user_id, points)
+   if await submit_task_answer(user_id, task.id, points, user_answer) is None:
+      await message.answer("Ответ на это задание уже принят")
+      return
     
    await message.answer(result_text)
     
-   next_task = await get_current_task(user_id, today)
+   next_task = plan.next_after(task.id)
     
    if next_task:
-      await send_task_message(message, next_task)
+      await send_task_message(message, next_task, state)
    else:
+      await state.clear()
       await message.answer("🎉 Поздравляем! Вы выполнили все задания на сегодня!")
@@ -1,5 +1,18 @@
 from .snowflake_helper import get_snowflakes_word
+from .cache import SingleFlightCache
+from .answer_matcher import AnswerMatcher, normalize_answer, get_answer_matcher
+from .background import spawn
+from .time_helper import MOSCOW_TZ, moscow_now, moscow_today, next_moscow_midnight
 
 __all__ = [
-   'get_snowflakes_word'
+   'get_snowflakes_word',
+   'SingleFlightCache',
+   'AnswerMatcher',
+   'normalize_answer',
+   'get_answer_matcher',
+   'spawn',
+   'MOSCOW_TZ',
+   'moscow_now',
+   'moscow_today',
+   'next_moscow_midnight'
 ]
\ No newline at end of file
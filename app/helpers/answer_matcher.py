@@ -0,0 +1,42 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable
+
+# Все виды тире и дефисов считаем обычным дефисом, кавычки не учитываем вовсе
+_TRANSLATION = str.maketrans({
+    'ё': 'е',
+    **{dash: '-' for dash in '‐‑‒–—―−'},
+    **{quote: None for quote in '"\'`«»„“”‘’‚'},
+})
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_answer(answer: str) -> str:
+    """Приводит ответ к виду для сравнения: регистр, ё/е, тире, кавычки и пробелы."""
+    return _WHITESPACE.sub(' ', answer.casefold().translate(_TRANSLATION)).strip()
+
+
+@dataclass(frozen=True, slots=True)
+class AnswerMatcher:
+    """Normalized accepted variants of a task answer."""
+    variants: frozenset[str]
+
+    @classmethod
+    def from_answers(cls, answers: Iterable[str]) -> 'AnswerMatcher':
+        return cls(frozenset(filter(None, map(normalize_answer, answers))))
+
+    def matches(self, answer: str) -> bool:
+        return normalize_answer(answer) in self.variants
+
+
+@lru_cache(maxsize=256)
+def _build_matcher(correct_answer: str, accepted_answers: tuple[str, ...]) -> AnswerMatcher:
+    return AnswerMatcher.from_answers((correct_answer, *accepted_answers))
+
+def get_answer_matcher(task) -> AnswerMatcher:
+    """
+    Matcher for the task's correct answer plus its accepted variants.
+    Built once per distinct set of answers, so an edited task gets a new one.
+    """
+    return _build_matcher(task.correct_answer, tuple(task.accepted_answers or ()))
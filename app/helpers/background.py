@@ -0,0 +1,24 @@
+import asyncio
+import logging
+from typing import Any, Coroutine
+
+logger = logging.getLogger(__name__)
+
+# Ссылки на фоновые задачи: иначе сборщик мусора может удалить задачу, не дав ей закончиться
+_tasks: set[asyncio.Task] = set()
+
+
+def spawn(coro: Coroutine[Any, Any, Any], name: str | None = None) -> asyncio.Task:
+    """Run `coro` in the background, keeping the task alive and logging its failure."""
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    task.add_done_callback(_log_failure)
+    return task
+
+def _log_failure(task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error("Background task %s failed: %s", task.get_name(), error, exc_info=error)
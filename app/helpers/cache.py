@@ -0,0 +1,55 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class SingleFlightCache(Generic[K, V]):
+    """
+    Кэш значений по ключу: одновременные промахи по одному ключу
+    ждут одну и ту же загрузку, а не запускают каждый свою.
+    """
+
+    def __init__(self):
+        self._values: dict[K, V] = {}
+        self._loading: dict[K, asyncio.Task] = {}
+        self._generation = 0
+
+    async def get(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader, self._generation))
+            self._loading[key] = task
+            task.add_done_callback(lambda done: self._forget_loading(key, done))
+        # shield: отмена одного ожидающего не должна отменять общую загрузку
+        return await asyncio.shield(task)
+
+    async def _load(self, key: K, loader: Callable[[], Awaitable[V]], generation: int) -> V:
+        value = await loader()
+        # Значение, посчитанное до invalidate(), уже может быть устаревшим
+        if generation == self._generation:
+            self._values[key] = value
+        return value
+
+    def _forget_loading(self, key: K, task: asyncio.Task) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if not task.cancelled():
+            task.exception()  # исключение уже получили ожидающие
+
+    def keys(self) -> list[K]:
+        return list(self._values)
+
+    def discard(self, key: K) -> None:
+        self._values.pop(key, None)
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._values.clear()
+        self._loading.clear()
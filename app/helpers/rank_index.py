@@ -0,0 +1,118 @@
+import bisect
+from typing import Any, Iterable, NamedTuple
+
+from app.database import invalidation
+from app.helpers.background import spawn
+
+import app.database.requests as db_requests
+
+
+class RankedUser(NamedTuple):
+    user_id: int
+    score: int
+    rank: int
+
+
+class RankIndex:
+    """
+    Плотный рейтинг (как dense_rank() в /stats) по баллам пользователей.
+
+    Хранит отсортированные массивы (-score, user_id) и различных значений баллов,
+    поэтому место и соседей пользователя находим бинарным поиском за O(log n).
+    """
+
+    def __init__(self):
+        self._scores: dict[int, int] = {}
+        self._entries: list[tuple[int, int]] = []
+        self._distinct: list[int] = []
+        self._counts: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def load(self, scores: Iterable[tuple[int, int]]) -> None:
+        self._scores = dict(scores)
+        self._entries = sorted((-score, user_id) for user_id, score in self._scores.items())
+        self._counts = {}
+        for score in self._scores.values():
+            self._counts[score] = self._counts.get(score, 0) + 1
+        self._distinct = sorted(-score for score in self._counts)
+
+    def update(self, user_id: int, score: int) -> None:
+        if self._scores.get(user_id) == score:
+            return
+        self.remove(user_id)
+        self._scores[user_id] = score
+        bisect.insort(self._entries, (-score, user_id))
+        if score not in self._counts:
+            bisect.insort(self._distinct, -score)
+        self._counts[score] = self._counts.get(score, 0) + 1
+
+    def remove(self, user_id: int) -> None:
+        score = self._scores.pop(user_id, None)
+        if score is None:
+            return
+        del self._entries[bisect.bisect_left(self._entries, (-score, user_id))]
+        self._counts[score] -= 1
+        if not self._counts[score]:
+            del self._counts[score]
+            del self._distinct[bisect.bisect_left(self._distinct, -score)]
+
+    def score(self, user_id: int) -> int | None:
+        return self._scores.get(user_id)
+
+    def _rank_of_score(self, score: int) -> int:
+        return bisect.bisect_left(self._distinct, -score) + 1
+
+    def rank(self, user_id: int) -> int | None:
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._rank_of_score(score)
+
+    def around(self, user_id: int, radius: int = 2) -> list[RankedUser]:
+        """Up to `radius` users above and below the given one, including the user itself."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return []
+        position = bisect.bisect_left(self._entries, (-score, user_id))
+        window = self._entries[max(position - radius, 0):position + radius + 1]
+        return [RankedUser(other_id, -neg_score, self._rank_of_score(-neg_score)) for neg_score, other_id in window]
+
+    def next_score(self, user_id: int) -> int | None:
+        """Smallest score above the user's one, i.e. what is needed to climb one place."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        position = bisect.bisect_left(self._distinct, -score)
+        return -self._distinct[position - 1] if position else None
+
+
+rank_index = RankIndex()
+
+
+async def load_rank_index() -> int:
+    rank_index.load(await db_requests.get_user_scores())
+    return len(rank_index)
+
+async def _refresh_user(user_id: int) -> None:
+    score = await db_requests.get_user_score(user_id)
+    if score is None:
+        rank_index.remove(user_id)
+    else:
+        rank_index.update(user_id, score)
+
+def on_score_event(data: dict[str, Any]) -> None:
+    user_id = data.get('user_id')
+    if user_id is None:
+        # Неизвестно, что изменилось - перечитываем все баллы
+        spawn(load_rank_index(), name='rank_index:reload')
+    elif data.get('deleted'):
+        rank_index.remove(user_id)
+    elif data.get('score') is not None:
+        rank_index.update(user_id, data['score'])
+    else:
+        spawn(_refresh_user(user_id), name=f'rank_index:refresh:{user_id}')
+
+invalidation.subscribe('scores', on_score_event)
+invalidation.subscribe('users', on_score_event)
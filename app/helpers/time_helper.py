@@ -0,0 +1,19 @@
+from datetime import date, datetime, time, timedelta
+
+import pytz
+
+MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+
+def moscow_now() -> datetime:
+    """Текущее время по Москве (aware), не зависит от TZ процесса."""
+    return datetime.now(MOSCOW_TZ)
+
+def moscow_today() -> date:
+    return moscow_now().date()
+
+def next_moscow_midnight(now: datetime | None = None) -> datetime:
+    """Ближайшая полночь по Москве после `now`."""
+    now = now or moscow_now()
+    tomorrow = now.astimezone(MOSCOW_TZ).date() + timedelta(days=1)
+    return MOSCOW_TZ.localize(datetime.combine(tomorrow, time.min))
@@ -22,6 +22,18 @@ def create_events_keyboard(events):
 # Использование
 events_keyboard = create_events_keyboard
 
+def create_stats_keyboard(prev_cursor, next_cursor):
+   # Курсор страницы рейтинга - пара (score, id) первой или последней строки
+   row_buttons = []
+   if prev_cursor:
+      row_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"stats:prev:{prev_cursor[0]}:{prev_cursor[1]}"))
+   if next_cursor:
+      row_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"stats:next:{next_cursor[0]}:{next_cursor[1]}"))
+
+   if not row_buttons:
+      return None
+   return InlineKeyboardMarkup(inline_keyboard=[row_buttons])
+
 # Клавиатура для начала регистрации
 register_keyboard = InlineKeyboardMarkup(inline_keyboard=[
    [InlineKeyboardButton(text="✅ Зарегистрироваться", callback_data="register")],
@@ -30,3 +42,13 @@ register_keyboard = InlineKeyboardMarkup(inline_keyboard=[
 cancel_checkin_keyboard = InlineKeyboardMarkup(inline_keyboard=[
    [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_checkin")]
 ])
+
+def create_tf_keyboard(task_id):
+   return InlineKeyboardMarkup(
+      inline_keyboard=[
+         [
+            InlineKeyboardButton(text="✅ Правда", callback_data=f"tf_{task_id}_True"),
+            InlineKeyboardButton(text="❌ Ложь", callback_data=f"tf_{task_id}_False")
+         ]
+      ]
+   )
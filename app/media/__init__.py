@@ -0,0 +1,25 @@
+from .catalog import (
+   MediaEntry,
+   media_catalog,
+)
+
+from .cache import (
+   answer_media,
+   send_media,
+   load_file_ids,
+)
+
+from .warmup import (
+   WarmupReport,
+   warm_up_media,
+)
+
+__all__ = [
+   'MediaEntry',
+   'media_catalog',
+   'answer_media',
+   'send_media',
+   'load_file_ids',
+   'WarmupReport',
+   'warm_up_media'
+]
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+import app.database.requests as db_requests
+from app.media.catalog import MediaEntry
+
+logger = logging.getLogger(__name__)
+
+SendPhoto = Callable[..., Awaitable[Message]]
+
+# (path, sha256) -> Telegram file_id
+_file_ids: dict[tuple[str, str], str] = {}
+# Фрагменты ответов Telegram, означающие, что сохраненный file_id больше не годится
+FILE_ID_ERROR_MARKERS = (
+   'wrong file identifier',
+   'wrong remote file identifier',
+   'file_id',
+   'file reference',
+   'wrong type of the web page content',
+)
+# Одна загрузка на файл, даже если его одновременно запросили сотни пользователей
+_upload_locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+
+async def load_file_ids() -> int:
+   """Preload every known file_id from the database. Returns the number of cached entries."""
+   _file_ids.update(await db_requests.get_all_media_file_ids())
+   return len(_file_ids)
+
+async def get_file_id(path: str, content_hash: str) -> str | None:
+   key = (path, content_hash)
+   file_id = _file_ids.get(key)
+   if file_id is None:
+      file_id = await db_requests.get_media_file_id(path, content_hash)
+      if file_id:
+         _file_ids[key] = file_id
+   return file_id
+
+async def remember_file_id(path: str, content_hash: str, file_id: str, size: int) -> None:
+   _file_ids[(path, content_hash)] = file_id
+   try:
+      await db_requests.save_media_file_id(path, content_hash, file_id, size)
+   except Exception as e:
+      # file_id остается в памяти процесса, в БД сохраним при следующей загрузке
+      logger.error("Failed to persist file_id for %s: %s", path, e, exc_info=True)
+
+def forget_file_id(path: str, content_hash: str) -> None:
+   _file_ids.pop((path, content_hash), None)
+
+def is_file_id_error(error: TelegramBadRequest) -> bool:
+   """True when Telegram rejected the file identifier itself, not the rest of the request."""
+   text = error.message.lower()
+   return any(marker in text for marker in FILE_ID_ERROR_MARKERS)
+
+async def _send_by_file_id(send: SendPhoto, path: str, content_hash: str, **kwargs: Any) -> Message | None:
+   file_id = await get_file_id(path, content_hash)
+   if not file_id:
+      return None
+   try:
+      return await send(photo=file_id, **kwargs)
+   except TelegramBadRequest as e:
+      # Остальные ошибки (чат не найден, неверная разметка подписи...) повторная загрузка не исправит
+      if not is_file_id_error(e):
+         raise
+      logger.warning("Cached file_id for %s was rejected, uploading again: %s", path, e)
+      forget_file_id(path, content_hash)
+      return None
+
+async def _send_photo(send: SendPhoto, path: str, content_hash: str, size: int, **kwargs: Any) -> Message:
+   sent = await _send_by_file_id(send, path, content_hash, **kwargs)
+   if sent:
+      return sent
+
+   lock = _upload_locks.setdefault((path, content_hash), asyncio.Lock())
+   async with lock:
+      # Пока ждали блокировку, файл мог загрузить другой обработчик
+      if (path, content_hash) in _file_ids:
+         sent = await _send_by_file_id(send, path, content_hash, **kwargs)
+         if sent:
+            return sent
+
+      sent = await send(photo=FSInputFile(path), **kwargs)
+      await remember_file_id(path, content_hash, sent.photo[-1].file_id, size)
+      return sent
+
+async def send_media(send: SendPhoto, entry: MediaEntry, **kwargs: Any) -> Message:
+   """
+   Send a catalog image through `send` (message.answer_photo, bot.send_photo, ...),
+   reusing the Telegram file_id after the first upload. The optimized variant
+   is sent when it exists.
+   """
+   return await _send_photo(send, entry.send_path, entry.send_hash, entry.send_size, **kwargs)
+
+async def answer_media(message: Message, entry: MediaEntry, **kwargs: Any) -> Message:
+   return await send_media(message.answer_photo, entry, **kwargs)
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from config import MEDIA_BUILD_DIR
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class MediaKind:
+   name: str
+   directory: str
+   prefix: str
+   date_format: str
+   monthly: bool = False
+
+   def path_for(self, day: date) -> str:
+      return os.path.join(self.directory, f"{self.prefix}{day.strftime(self.date_format)}.jpg")
+
+   def parse_day(self, filename: str) -> date | None:
+      stem, ext = os.path.splitext(filename)
+      if ext.lower() != '.jpg' or not stem.startswith(self.prefix):
+         return None
+      try:
+         return datetime.strptime(stem[len(self.prefix):], self.date_format).date()
+      except ValueError:
+         return None
+
+   def key_day(self, day: date) -> date:
+      # Расписание одно на месяц - храним его под первым числом
+      return day.replace(day=1) if self.monthly else day
+
+MEDIA_KINDS = {
+   kind.name: kind for kind in (
+      MediaKind('message', 'public/message', 'photo_message_', '%Y-%m-%d'),
+      MediaKind('ai_image', 'public/ai_images', 'photo_ai_image_', '%Y-%m-%d'),
+      MediaKind('dish_image', 'public/dish_images', 'photo_dish_image_', '%Y-%m-%d'),
+      MediaKind('schedule', 'public/schedule', 'photo_schedule_', '%Y-%m', monthly=True),
+   )
+}
+
+
+@dataclass(frozen=True, slots=True)
+class OptimizedImage:
+   path: str
+   size: int
+   content_hash: str
+
+
+@dataclass(frozen=True, slots=True)
+class MediaEntry:
+   kind: str
+   day: date
+   path: str
+   size: int
+   content_hash: str
+   mtime_ns: int
+   optimized: OptimizedImage | None = None
+
+   # Пользователям отправляем оптимизированный вариант, если он собран
+   @property
+   def send_path(self) -> str:
+      return self.optimized.path if self.optimized else self.path
+
+   @property
+   def send_size(self) -> int:
+      return self.optimized.size if self.optimized else self.size
+
+   @property
+   def send_hash(self) -> str:
+      return self.optimized.content_hash if self.optimized else self.content_hash
+
+def hash_file(path: str) -> str:
+   digest = hashlib.sha256()
+   with open(path, 'rb') as f:
+      for chunk in iter(lambda: f.read(1 << 16), b''):
+         digest.update(chunk)
+   return digest.hexdigest()
+
+def manifest_path(build_dir: str = MEDIA_BUILD_DIR) -> str:
+   return os.path.join(build_dir, 'manifest.json')
+
+def load_manifest(build_dir: str = MEDIA_BUILD_DIR) -> dict[str, OptimizedImage]:
+   """Source sha256 -> optimized variant, only for variants that exist on disk."""
+   try:
+      with open(manifest_path(build_dir), encoding='utf-8') as f:
+         images = json.load(f).get('images', {})
+   except FileNotFoundError:
+      return {}
+   except (OSError, ValueError) as e:
+      logger.error("Failed to read media manifest: %s", e)
+      return {}
+
+   return {
+      source_hash: OptimizedImage(image['path'], image['size'], image['hash'])
+      for source_hash, image in images.items()
+      if image.get('path') and os.path.isfile(image['path'])
+   }
+
+def _load_entry(
+   kind: MediaKind,
+   day: date,
+   path: str,
+   manifest: dict[str, OptimizedImage],
+   previous: MediaEntry | None = None,
+) -> MediaEntry | None:
+   try:
+      stat = os.stat(path)
+   except FileNotFoundError:
+      return None
+   if previous and previous.mtime_ns == stat.st_mtime_ns and previous.size == stat.st_size:
+      content_hash = previous.content_hash
+   else:
+      content_hash = hash_file(path)
+   return MediaEntry(
+      kind.name, day, os.path.normpath(path), stat.st_size, content_hash, stat.st_mtime_ns,
+      optimized=manifest.get(content_hash),
+   )
+
+
+class MediaCatalog:
+   """In-memory index of the public/ tree: (kind, date) -> file, size and sha256."""
+
+   def __init__(self, kinds: dict[str, MediaKind] = MEDIA_KINDS, build_dir: str = MEDIA_BUILD_DIR):
+      self.kinds = kinds
+      self.build_dir = build_dir
+      self._entries: dict[tuple[str, date], MediaEntry] = {}
+      self._manifest: dict[str, OptimizedImage] = {}
+
+   def _scan(self) -> tuple[dict[tuple[str, date], MediaEntry], int]:
+      entries = {}
+      changed = 0
+      self._manifest = load_manifest(self.build_dir)
+      for kind in self.kinds.values():
+         if not os.path.isdir(kind.directory):
+            continue
+         for dir_entry in os.scandir(kind.directory):
+            day = kind.parse_day(dir_entry.name)
+            if day is None or not dir_entry.is_file():
+               continue
+            key = (kind.name, day)
+            previous = self._entries.get(key)
+            entry = _load_entry(kind, day, dir_entry.path, self._manifest, previous)
+            if entry is None:
+               continue
+            if entry != previous:
+               changed += 1
+            entries[key] = entry
+      return entries, changed
+
+   async def refresh(self) -> int:
+      """
+      Rescan public/ and the optimization manifest, hashing only new or modified files.
+      Returns the number of added or changed entries.
+      """
+      entries, changed = await asyncio.to_thread(self._scan)
+      removed = len(self._entries.keys() - entries.keys())
+      self._entries = entries
+      if changed or removed:
+         logger.info("Media catalog refreshed: %d added/changed, %d removed, %d total", changed, removed, len(entries))
+      return changed
+
+   async def get(self, kind_name: str, day: date) -> MediaEntry | None:
+      kind = self.kinds[kind_name]
+      key = (kind.name, kind.key_day(day))
+      entry = self._entries.get(key)
+      if entry is not None:
+         entry = await self.revalidate(entry)
+      if entry is None:
+         # Файл могли добавить после построения каталога - проверяем только ожидаемый путь
+         path = kind.path_for(key[1])
+         if not os.path.isfile(path):
+            return None
+         entry = await asyncio.to_thread(_load_entry, kind, key[1], path, self._manifest)
+         if entry:
+            self._entries[key] = entry
+      return entry
+
+   async def revalidate(self, entry: MediaEntry) -> MediaEntry | None:
+      """
+      Return the entry as it is on disk now: the same object while the file's mtime and size
+      are unchanged, a re-hashed entry if the file was replaced, None if it was deleted.
+      """
+      key = (entry.kind, entry.day)
+      try:
+         stat = os.stat(entry.path)
+      except FileNotFoundError:
+         if self._entries.get(key) is entry:
+            del self._entries[key]
+         return None
+      if stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size:
+         return entry
+
+      # Картинку заменили под тем же именем - новый хэш, а с ним и новый file_id
+      updated = await asyncio.to_thread(
+         _load_entry, self.kinds[entry.kind], entry.day, entry.path, self._manifest, entry
+      )
+      if updated:
+         self._entries[key] = updated
+      return updated
+
+   def latest(self, kind_name: str) -> MediaEntry | None:
+      entries = [entry for (name, _), entry in self._entries.items() if name == kind_name]
+      return max(entries, key=lambda entry: entry.day, default=None)
+
+   def entries(self) -> list[MediaEntry]:
+      return list(self._entries.values())
+
+   def days(self, kind_name: str) -> list[date]:
+      return sorted(day for name, day in self._entries if name == kind_name)
+
+   def gaps(self, kind_name: str, start: date, end: date) -> list[date]:
+      """Dates in [start, end] without content of the given kind."""
+      kind = self.kinds[kind_name]
+      missing = []
+      day = kind.key_day(start)
+      while day <= end:
+         if (kind.name, day) not in self._entries:
+            missing.append(day)
+         if kind.monthly:
+            day = (day + timedelta(days=32)).replace(day=1)
+         else:
+            day += timedelta(days=1)
+      return missing
+
+media_catalog = MediaCatalog()
@@ -0,0 +1,148 @@
+"""
+Offline re-encoding of public/ images to a Telegram-friendly size.
+
+Usage: python -m app.media.optimize [--workers N] [--max-side 1280] [--quality 85] [--force]
+
+Results are written to MEDIA_BUILD_DIR together with manifest.json
+(source sha256 -> optimized file); the media catalog picks them up on refresh.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from config import MEDIA_BUILD_DIR
+from app.media.catalog import MEDIA_KINDS, hash_file, manifest_path
+
+logger = logging.getLogger(__name__)
+
+# Telegram все равно ужимает фото до 1280 px по большей стороне
+DEFAULT_MAX_SIDE = 1280
+DEFAULT_QUALITY = 85
+MANIFEST_VERSION = 1
+
+
+@dataclass(frozen=True, slots=True)
+class OptimizeJob:
+   source: str
+   source_hash: str
+   target: str
+   max_side: int
+   quality: int
+
+def _optimize(job: OptimizeJob) -> dict:
+   # Pillow нужен только для сборки, боту он не требуется
+   from PIL import Image, ImageOps
+
+   with Image.open(job.source) as image:
+      image = ImageOps.exif_transpose(image)
+      if image.mode != 'RGB':
+         image = image.convert('RGB')
+      image.thumbnail((job.max_side, job.max_side), Image.Resampling.LANCZOS)
+
+      os.makedirs(os.path.dirname(job.target), exist_ok=True)
+      image.save(job.target, 'JPEG', quality=job.quality, optimize=True, progressive=True)
+
+   size = os.path.getsize(job.target)
+   source_size = os.path.getsize(job.source)
+   if size >= source_size:
+      # Перекодирование не помогло - отправляем оригинал
+      os.remove(job.target)
+      return {'source': job.source, 'path': None, 'size': source_size, 'hash': job.source_hash}
+   return {'source': job.source, 'path': job.target, 'size': size, 'hash': hash_file(job.target)}
+
+def _read_manifest(path: str) -> dict:
+   try:
+      with open(path, encoding='utf-8') as f:
+         return json.load(f)
+   except (OSError, ValueError):
+      return {}
+
+def _write_manifest(path: str, manifest: dict) -> None:
+   os.makedirs(os.path.dirname(path), exist_ok=True)
+   tmp_path = f"{path}.tmp"
+   with open(tmp_path, 'w', encoding='utf-8') as f:
+      json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+   # Замена атомарна, бот никогда не прочитает недописанный манифест
+   os.replace(tmp_path, path)
+
+def _is_fresh(image: dict | None) -> bool:
+   return bool(image) and (image['path'] is None or os.path.isfile(image['path']))
+
+def optimize_media(
+   build_dir: str = MEDIA_BUILD_DIR,
+   max_side: int = DEFAULT_MAX_SIDE,
+   quality: int = DEFAULT_QUALITY,
+   workers: int | None = None,
+   force: bool = False,
+) -> tuple[int, int]:
+   """Re-encode new or changed images. Returns (processed, skipped) counts."""
+   path = manifest_path(build_dir)
+   manifest = _read_manifest(path)
+   settings = {'version': MANIFEST_VERSION, 'max_side': max_side, 'quality': quality}
+   if force or any(manifest.get(key) != value for key, value in settings.items()):
+      manifest = {}
+   images = manifest.get('images', {})
+
+   jobs = []
+   sources = set()
+   for kind in MEDIA_KINDS.values():
+      if not os.path.isdir(kind.directory):
+         continue
+      for dir_entry in sorted(os.scandir(kind.directory), key=lambda entry: entry.name):
+         if not dir_entry.is_file() or kind.parse_day(dir_entry.name) is None:
+            continue
+         source = os.path.normpath(dir_entry.path)
+         source_hash = hash_file(source)
+         # Одинаковые картинки под разными датами кодируем один раз
+         if source_hash in sources:
+            continue
+         sources.add(source_hash)
+         if _is_fresh(images.get(source_hash)):
+            continue
+         target = os.path.join(build_dir, os.path.relpath(source, 'public'))
+         jobs.append(OptimizeJob(source, source_hash, target, max_side, quality))
+
+   skipped = len(sources) - len(jobs)
+   if jobs:
+      with ProcessPoolExecutor(max_workers=workers) as executor:
+         for job, image in zip(jobs, executor.map(_optimize, jobs)):
+            images[job.source_hash] = image
+            if image['path']:
+               logger.info("%s: %d -> %d bytes", job.source, os.path.getsize(job.source), image['size'])
+            else:
+               logger.info("%s: already optimal, keeping the original", job.source)
+
+   # Удаленные из public/ картинки убираем из манифеста
+   images = {source_hash: image for source_hash, image in images.items() if source_hash in sources}
+   _write_manifest(path, {**settings, 'images': images})
+   return len(jobs), skipped
+
+def main(argv: list[str] | None = None) -> None:
+   parser = argparse.ArgumentParser(description="Re-encode public/ images for Telegram")
+   parser.add_argument('--build-dir', default=MEDIA_BUILD_DIR)
+   parser.add_argument('--max-side', type=int, default=DEFAULT_MAX_SIDE)
+   parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY)
+   parser.add_argument('--workers', type=int, default=None, help="process pool size (default: CPU count)")
+   parser.add_argument('--force', action='store_true', help="re-encode everything")
+   args = parser.parse_args(argv)
+
+   processed, skipped = optimize_media(
+      build_dir=args.build_dir,
+      max_side=args.max_side,
+      quality=args.quality,
+      workers=args.workers,
+      force=args.force,
+   )
+   logger.info("Done: %d processed, %d unchanged", processed, skipped)
+
+if __name__ == '__main__':
+   logging.basicConfig(
+      level=logging.INFO,
+      format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+      handlers=[logging.StreamHandler(sys.stdout)]
+   )
+   main()
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import partial
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.media.cache import get_file_id, send_media
+from app.media.catalog import MediaEntry, media_catalog
+from app.middlewares.send_queue import bulk_sending
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class WarmupReport:
+   uploaded_files: int = 0
+   uploaded_bytes: int = 0
+   skipped_files: int = 0
+   skipped_bytes: int = 0
+   failed_files: int = 0
+
+   def __str__(self) -> str:
+      return (
+         f"uploaded {self.uploaded_files} files ({self.uploaded_bytes} bytes), "
+         f"skipped {self.skipped_files} files ({self.skipped_bytes} bytes), "
+         f"failed {self.failed_files}"
+      )
+
+async def warm_up_media(
+   bot: Bot,
+   chat_id: int,
+   concurrency: int = 4,
+   entries: list[MediaEntry] | None = None,
+   max_retries: int = 3,
+) -> WarmupReport:
+   """
+   Upload every not yet cached image of the media catalog (or only `entries`)
+   to the service chat so that users are always served by file_id.
+   """
+   report = WarmupReport()
+   semaphore = asyncio.Semaphore(concurrency)
+   send = partial(bot.send_photo, chat_id, disable_notification=True)
+
+   async def warm_up(entry: MediaEntry) -> None:
+      async with semaphore:
+         if await get_file_id(entry.send_path, entry.send_hash):
+            report.skipped_files += 1
+            report.skipped_bytes += entry.send_size
+            return
+
+         for attempt in range(max_retries + 1):
+            try:
+               await send_media(send, entry)
+               report.uploaded_files += 1
+               report.uploaded_bytes += entry.send_size
+               return
+            except TelegramRetryAfter as e:
+               if attempt == max_retries:
+                  break
+               logger.warning("Flood control on %s, retrying in %d s", entry.send_path, e.retry_after)
+               await asyncio.sleep(e.retry_after)
+            except Exception as e:
+               logger.error("Failed to upload %s: %s", entry.send_path, e, exc_info=True)
+               break
+
+         report.failed_files += 1
+
+   if entries is None:
+      entries = media_catalog.entries()
+   # Прогрев не должен задерживать ответы пользователям
+   with bulk_sending():
+      await asyncio.gather(*(warm_up(entry) for entry in entries))
+   logger.info("Media warm-up finished: %s", report)
+   return report
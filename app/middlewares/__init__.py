@@ -0,0 +1,25 @@
+from .registered_user import (
+   RegisteredUserMiddleware,
+   registered_users,
+)
+from .send_queue import (
+   SendQueueMiddleware,
+   SendScheduler,
+   bulk_sending,
+   send_priority,
+   PRIORITY_INTERACTIVE,
+   PRIORITY_BULK,
+)
+from .update_flow import UpdateFlowMiddleware
+
+__all__ = [
+   'RegisteredUserMiddleware',
+   'registered_users',
+   'SendQueueMiddleware',
+   'SendScheduler',
+   'bulk_sending',
+   'send_priority',
+   'PRIORITY_INTERACTIVE',
+   'PRIORITY_BULK',
+   'UpdateFlowMiddleware'
+]
@@ -0,0 +1,122 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import invalidation
+from app.database.models import User
+from app.helpers.background import spawn
+
+import app.database.requests as db_requests
+
+logger = logging.getLogger(__name__)
+
+# Сколько помнить, что пользователь не зарегистрирован (регистрация сама сбрасывает отметку)
+NEGATIVE_TTL = 60
+
+DB_ERROR_TEXT = "❌ Произошла ошибка при обращении к базе данных. Попробуйте позже."
+
+
+class RegisteredUsersCache:
+   """Registered users by Telegram id, kept in sync through 'users'/'scores' invalidation events."""
+
+   def __init__(self):
+      self._users: dict[int, User] = {}
+      self._missing: dict[int, float] = {}
+
+   def __len__(self) -> int:
+      return len(self._users)
+
+   async def load(self) -> int:
+      users = await db_requests.get_all_users()
+      self._users = {user.id: user for user in users}
+      self._missing.clear()
+      return len(self._users)
+
+   def put(self, user: User) -> None:
+      self._users[user.id] = user
+      self._missing.pop(user.id, None)
+
+   def remove(self, user_id: int) -> None:
+      self._users.pop(user_id, None)
+
+   async def get(self, user_id: int) -> User | None:
+      user = self._users.get(user_id)
+      if user is not None:
+         return user
+
+      missing_since = self._missing.get(user_id)
+      if missing_since is not None and time.monotonic() - missing_since < NEGATIVE_TTL:
+         return None
+
+      # Пользователь мог появиться в другом процессе раньше, чем дошло событие
+      user = await db_requests.get_user_by_tg_id(user_id)
+      if user is None:
+         self._missing[user_id] = time.monotonic()
+      else:
+         self.put(user)
+      return user
+
+   def on_users_event(self, data: dict[str, Any]) -> None:
+      user_id = data.get('user_id')
+      if user_id is None:
+         spawn(self.load(), name='registered_users:reload')
+      elif data.get('deleted'):
+         self.remove(user_id)
+      elif data.get('first_name') is not None:
+         self.put(User(
+            id=user_id,
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            score=data['score'],
+         ))
+      else:
+         self.remove(user_id)
+
+   def on_scores_event(self, data: dict[str, Any]) -> None:
+      # Полный сброс ({}) приходит и в 'users', там кэш и перечитывается
+      user = self._users.get(data.get('user_id'))
+      if user is None:
+         return
+      if data.get('score') is not None:
+         user.score = data['score']
+      else:
+         # Без нового значения баллов проще перечитать пользователя при следующем запросе
+         self.remove(user.id)
+
+registered_users = RegisteredUsersCache()
+invalidation.subscribe('users', registered_users.on_users_event)
+invalidation.subscribe('scores', registered_users.on_scores_event)
+
+
+class RegisteredUserMiddleware(BaseMiddleware):
+   """
+   Puts the registered `User` of the update (or None) into handler data as `user`
+   and tells the user when the handler failed on a database error.
+   """
+
+   async def __call__(
+      self,
+      handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+      event: TelegramObject,
+      data: dict[str, Any],
+   ) -> Any:
+      from_user = data.get('event_from_user')
+      try:
+         data['user'] = await registered_users.get(from_user.id) if from_user else None
+         return await handler(event, data)
+      except SQLAlchemyError as e:
+         logger.error("Database error while handling %s: %s", type(event).__name__, e, exc_info=True)
+         await _reply_db_error(event)
+
+async def _reply_db_error(event: TelegramObject) -> None:
+   try:
+      if isinstance(event, CallbackQuery):
+         await event.answer(DB_ERROR_TEXT, show_alert=True)
+      elif isinstance(event, Message):
+         await event.answer(DB_ERROR_TEXT)
+   except Exception as e:
+      logger.warning("Failed to report database error to the user: %s", e)
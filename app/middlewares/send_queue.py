@@ -0,0 +1,215 @@
+"""
+Outgoing request pacing for the Bot session.
+
+Every request that targets a chat waits for a per-chat token (short bursts,
+then about one message per second) and for a global token (SEND_RATE_PER_SECOND).
+Global tokens are handed out by priority: interactive replies first, bulk
+traffic (broadcasts, media warm-up) when nothing else is waiting. Mark bulk
+senders with `with bulk_sending(): ...`. Flood-control answers are retried
+after the time Telegram asks for.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+if TYPE_CHECKING:
+   from aiogram import Bot
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+send_priority: ContextVar[int] = ContextVar('send_priority', default=PRIORITY_INTERACTIVE)
+
+# Раз в столько секунд пишем в лог сводку по очереди, если через нее что-то шло
+STATS_INTERVAL = 60
+# Сколько держать пустые корзины чатов, прежде чем забыть их
+CHAT_BUCKETS_LIMIT = 10_000
+
+
+@contextmanager
+def bulk_sending() -> Iterator[None]:
+   """Send everything inside the block with bulk priority."""
+   token = send_priority.set(PRIORITY_BULK)
+   try:
+      yield
+   finally:
+      send_priority.reset(token)
+
+
+class TokenBucket:
+   def __init__(self, rate: float, burst: float):
+      self.rate = rate
+      self.burst = burst
+      self.tokens = burst
+      self.updated = time.monotonic()
+
+   def refill(self) -> None:
+      now = time.monotonic()
+      self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+      self.updated = now
+
+   def try_take(self) -> float:
+      """Take a token and return 0, or return how long to wait for one."""
+      self.refill()
+      if self.tokens >= 1:
+         self.tokens -= 1
+         return 0.0
+      return (1 - self.tokens) / self.rate
+
+
+@dataclass(slots=True)
+class SendQueueStats:
+   queued: int = 0
+   sent: int = 0
+   retries: int = 0
+   total_wait: float = 0.0
+   max_wait: float = 0.0
+
+   @property
+   def avg_wait(self) -> float:
+      return self.total_wait / self.sent if self.sent else 0.0
+
+
+class SendScheduler:
+   def __init__(self, rate: float, chat_rate: float, chat_burst: float):
+      self._global = TokenBucket(rate, rate)
+      self._chat_rate = chat_rate
+      self._chat_burst = chat_burst
+      self._chats: dict[int | str, TokenBucket] = {}
+      self._chat_locks: dict[int | str, asyncio.Lock] = {}
+      self._queue: list[tuple[int, int, asyncio.Future]] = []
+      self._sequence = itertools.count()
+      self._wakeup = asyncio.Event()
+      self._worker: asyncio.Task | None = None
+      self.stats = SendQueueStats()
+      self._window = SendQueueStats()
+      self._window_started = time.monotonic()
+
+   @property
+   def depth(self) -> int:
+      """Requests waiting for a global token right now."""
+      return len(self._queue)
+
+   async def acquire(self, chat_id: int | str, priority: int) -> None:
+      started = time.monotonic()
+      await self._acquire_chat(chat_id)
+      await self._acquire_global(priority)
+      self._record_wait(time.monotonic() - started)
+
+   async def _acquire_chat(self, chat_id: int | str) -> None:
+      lock = self._chat_locks.get(chat_id)
+      if lock is None:
+         if len(self._chats) >= CHAT_BUCKETS_LIMIT:
+            self._forget_idle_chats()
+         lock = self._chat_locks[chat_id] = asyncio.Lock()
+         self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+      # Под замком сообщения одного чата уходят по очереди, в порядке вызова
+      async with lock:
+         while delay := self._chats[chat_id].try_take():
+            await asyncio.sleep(delay)
+
+   def _forget_idle_chats(self) -> None:
+      for chat_id, bucket in list(self._chats.items()):
+         bucket.refill()
+         if bucket.tokens >= bucket.burst and not self._chat_locks[chat_id].locked():
+            del self._chats[chat_id]
+            del self._chat_locks[chat_id]
+
+   async def _acquire_global(self, priority: int) -> None:
+      if not self._queue and not self._global.try_take():
+         return
+
+      future = asyncio.get_running_loop().create_future()
+      heapq.heappush(self._queue, (priority, next(self._sequence), future))
+      self.stats.queued += 1
+      self._wakeup.set()
+      if self._worker is None or self._worker.done():
+         self._worker = asyncio.create_task(self._dispatch())
+      await future
+
+   async def _dispatch(self) -> None:
+      while True:
+         if not self._queue:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+            continue
+         delay = self._global.try_take()
+         if delay:
+            await asyncio.sleep(delay)
+            continue
+         # Токен отдаем самому приоритетному ожидающему, отмененных пропускаем
+         while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+               future.set_result(None)
+               break
+         else:
+            # Все ожидающие отменились - токен возвращаем
+            self._global.tokens += 1
+
+   def _record_wait(self, wait: float) -> None:
+      for stats in (self.stats, self._window):
+         stats.sent += 1
+         stats.total_wait += wait
+         stats.max_wait = max(stats.max_wait, wait)
+
+      now = time.monotonic()
+      if now - self._window_started >= STATS_INTERVAL:
+         window = self._window
+         logger.info(
+            "Send queue: %d sent, %d queued, %d retries, wait avg %.3f s / max %.3f s, depth %d",
+            window.sent, window.queued, window.retries, window.avg_wait, window.max_wait, self.depth
+         )
+         self._window = SendQueueStats()
+         self._window_started = now
+
+   def record_retry(self) -> None:
+      self.stats.retries += 1
+      self._window.retries += 1
+
+
+class SendQueueMiddleware(BaseRequestMiddleware):
+   """Paces every request that has a chat_id through a SendScheduler and retries flood-control errors."""
+
+   def __init__(self, scheduler: SendScheduler, max_retries: int = 3):
+      self.scheduler = scheduler
+      self.max_retries = max_retries
+
+   async def __call__(
+      self,
+      make_request: NextRequestMiddlewareType[TelegramType],
+      bot: 'Bot',
+      method: TelegramMethod[TelegramType],
+   ) -> Response[TelegramType]:
+      chat_id = getattr(method, 'chat_id', None)
+      if chat_id is None:
+         # getUpdates, answerCallbackQuery и прочие служебные запросы не ограничиваем
+         return await make_request(bot, method)
+
+      priority = send_priority.get()
+      for attempt in range(self.max_retries + 1):
+         await self.scheduler.acquire(chat_id, priority)
+         try:
+            return await make_request(bot, method)
+         except TelegramRetryAfter as e:
+            if attempt == self.max_retries:
+               raise
+            self.scheduler.record_retry()
+            logger.warning(
+               "Flood control on %s to chat %s, retrying in %d s",
+               type(method).__name__, chat_id, e.retry_after
+            )
+            await asyncio.sleep(e.retry_after)
@@ -0,0 +1,95 @@
+"""
+Incoming update flow control.
+
+Updates of one user are handled strictly one after another by aiogram's event
+isolation (SimpleEventIsolation), which takes the user's lock before the FSM
+state is read. This middleware runs in front of it: it counts updates in
+progress, so that `drain()` can wait for them on shutdown, and drops updates
+of a user who already has too many queued (a dropped button press is still
+answered, so its spinner stops). The overall limit of updates in
+progress is applied where updates are fetched: `tasks_concurrency_limit` of
+polling or the webhook handler's semaphore.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+# Сколько апдейтов одного пользователя может ждать своей очереди, остальные отбрасываем
+MAX_PENDING_PER_USER = 10
+DROPPED_CALLBACK_TEXT = "⏳ Слишком много нажатий, подождите немного."
+
+
+class UpdateFlowMiddleware(BaseMiddleware):
+   """
+   Outer update middleware counting updates in progress. Must be registered
+   before the FSM middleware, so that updates waiting for the user's lock count too.
+   """
+
+   def __init__(self, max_pending_per_user: int = MAX_PENDING_PER_USER):
+      self.max_pending_per_user = max_pending_per_user
+      self._pending: dict[int | None, int] = {}
+      self._in_flight = 0
+      self._idle = asyncio.Event()
+      self._idle.set()
+
+   @property
+   def in_flight(self) -> int:
+      return self._in_flight
+
+   def setup(self, dp: Dispatcher) -> None:
+      """Register in front of the dispatcher's FSM middleware (and its event isolation)."""
+      dp.update.outer_middleware.unregister(dp.fsm)
+      dp.update.outer_middleware(self)
+      dp.update.outer_middleware(dp.fsm)
+
+   async def __call__(
+      self,
+      handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+      event: TelegramObject,
+      data: dict[str, Any],
+   ) -> Any:
+      from_user = data.get('event_from_user')
+      user_id = from_user.id if from_user else None
+      pending = self._pending.get(user_id, 0)
+      if user_id is not None and pending >= self.max_pending_per_user:
+         # Один пользователь не должен занимать все слоты обработки своими повторными нажатиями
+         logger.warning("Dropping update from user %d: %d updates already queued", user_id, pending)
+         callback_query = getattr(event, 'callback_query', None)
+         if callback_query is not None:
+            # Иначе у кнопки так и будут крутиться часики
+            try:
+               await callback_query.answer(DROPPED_CALLBACK_TEXT)
+            except TelegramAPIError as e:
+               logger.warning("Failed to answer dropped callback from user %d: %s", user_id, e)
+         return None
+
+      self._pending[user_id] = pending + 1
+      self._in_flight += 1
+      self._idle.clear()
+      try:
+         return await handler(event, data)
+      finally:
+         self._in_flight -= 1
+         if not self._in_flight:
+            self._idle.set()
+         self._pending[user_id] -= 1
+         if not self._pending[user_id]:
+            del self._pending[user_id]
+
+   async def drain(self, timeout: float) -> int:
+      """Wait up to `timeout` seconds for updates in progress. Returns how many are still running."""
+      # Задачи, уже созданные диспетчером, успевают войти в middleware
+      await asyncio.sleep(0)
+      if self._in_flight:
+         logger.info("Waiting for %d updates in progress", self._in_flight)
+         try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+         except asyncio.TimeoutError:
+            logger.warning("%d updates still in progress after %s s, stopping anyway", self._in_flight, timeout)
+      return self._in_flight
@@ -0,0 +1,187 @@
+"""
+Day rollover: everything the bot serves for a day is prepared in advance.
+
+A few minutes before midnight the next day's bundle is built: the task list
+(with compiled answer matchers), TF keyboards, rendered captions, media
+entries and their file_ids. Bundles are looked up by date, so at midnight the
+new day's bundle takes over without any extra work on the first requests.
+"""
+import logging
+import textwrap
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Any
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+
+import app.database.requests as db_requests
+from app.database import invalidation
+from app.database.models import Task
+from app.helpers.background import spawn
+from app.helpers.time_helper import moscow_today
+from app.keyboards import create_tf_keyboard
+from app.media import MediaEntry, media_catalog, warm_up_media
+from app.media.cache import get_file_id
+
+logger = logging.getLogger(__name__)
+
+# Какая картинка прикладывается к заданию каждого типа
+TASK_MEDIA_KINDS = {
+   'AI': 'ai_image',
+   'DISH': 'dish_image',
+}
+
+
+@dataclass(frozen=True, slots=True)
+class TaskView:
+   text: str
+   keyboard: InlineKeyboardMarkup | None = None
+   media: MediaEntry | None = None
+
+@dataclass(slots=True)
+class DayBundle:
+   day: date
+   tasks: tuple[Task, ...]
+   views: dict[int, TaskView]
+   message: MediaEntry | None
+
+   def media_entries(self) -> list[MediaEntry]:
+      entries = [view.media for view in self.views.values() if view.media]
+      if self.message:
+         entries.append(self.message)
+      return entries
+
+def render_task_text(task: Task) -> str:
+   if task.type == 'TF':
+      return textwrap.dedent(f'''
+         1️⃣ Задание 1/3: <b>Новый год в разных странах</b>. Правда vs Ложь
+
+         {task.description}
+
+         Выберите правильный ответ:
+      ''')
+
+   if task.type == 'AI':
+      return textwrap.dedent('''
+         2️⃣ Задание 2/3: <b>Напишите название новогоднего фильма/мультфильма</b>, к которому представлена эта ИИ-афиша.
+
+         Пишите ответ без кавычек и с большой буквы.
+         Например: Кислород.
+
+         ✨ Название пишем полностью, как в оригинальном названии фильма;
+         ✨ Буквы «Е» и «Ё» равноправны и не влияют на ответ;
+         ✨ Если в названии есть имена собственные, пишем их с большой буквы;
+         ✨ Если это серия фильмов, то давать указание на часть не нужно:
+
+         ✅ Чебурашка
+         ❌ Чебурашка 2
+
+         🎬 Напишите название фильма в ответном сообщении.
+      ''')
+
+   description_part = f"\nОписание: {task.description}\n" if task.description else ""
+   return (
+      f'3️⃣ Задание 3/3: <b>Угадай название салата на праздничный стол</b> 🥗\n'
+      f'{description_part}\n'
+      f'✨ Если вы не знаете, что это за салат, придумайте ему своё оригинальное название\n'
+      f'✨ Баллы за это задание начисляются всем!\n'
+      f'✨ Креативьте друзья, давайте посмеёмся 🤗'
+   )
+
+async def render_task_view(task: Task, day: date) -> TaskView:
+   keyboard = create_tf_keyboard(task.id) if task.type == 'TF' else None
+   kind = TASK_MEDIA_KINDS.get(task.type)
+   media = await media_catalog.get(kind, day) if kind else None
+   return TaskView(text=render_task_text(task), keyboard=keyboard, media=media)
+
+async def _current_media(entry: MediaEntry | None, kind: str, day: date) -> MediaEntry | None:
+   # Картинку могли положить или заменить уже после сборки пакета
+   if entry is not None:
+      entry = await media_catalog.revalidate(entry)
+   return entry or await media_catalog.get(kind, day)
+
+
+class DayRollover:
+   """Prepared bundles by Moscow date; dropped and rebuilt on 'tasks' events."""
+
+   def __init__(self):
+      self._bundles: dict[date, DayBundle] = {}
+      self._generation = 0
+      self._bot: Bot | None = None
+      self._media_chat_id: int | None = None
+
+   def get(self, day: date) -> DayBundle | None:
+      return self._bundles.get(day)
+
+   async def task_view(self, task: Task, day: date) -> TaskView:
+      bundle = self._bundles.get(day)
+      view = bundle.views.get(task.id) if bundle else None
+      if view is None:
+         return await render_task_view(task, day)
+
+      kind = TASK_MEDIA_KINDS.get(task.type)
+      if kind:
+         media = await _current_media(view.media, kind, day)
+         if media is not view.media:
+            view = bundle.views[task.id] = replace(view, media=media)
+      return view
+
+   async def message_entry(self, day: date) -> MediaEntry | None:
+      bundle = self._bundles.get(day)
+      if bundle is None:
+         return await media_catalog.get('message', day)
+      bundle.message = await _current_media(bundle.message, 'message', day)
+      return bundle.message
+
+   async def prepare(self, day: date, bot: Bot | None = None, media_chat_id: int | None = None) -> DayBundle:
+      """Build the bundle for `day`, upload its images if a media chat is given and install it."""
+      if bot is not None:
+         self._bot, self._media_chat_id = bot, media_chat_id
+      generation = self._generation
+
+      # Картинки на завтра могли положить в public/ в течение дня
+      await media_catalog.refresh()
+      tasks = tuple(await db_requests.get_tasks_by_date(day))
+      bundle = DayBundle(
+         day=day,
+         tasks=tasks,
+         views={task.id: await render_task_view(task, day) for task in tasks},
+         message=await media_catalog.get('message', day),
+      )
+
+      entries = bundle.media_entries()
+      if entries and self._bot and self._media_chat_id:
+         await warm_up_media(self._bot, self._media_chat_id, entries=entries)
+      else:
+         # Без служебного чата хотя бы поднимаем известные file_id из БД в память
+         for entry in entries:
+            await get_file_id(entry.send_path, entry.send_hash)
+
+      if generation != self._generation:
+         # Задания поменялись, пока собирали пакет - собираем заново
+         return await self.prepare(day)
+
+      today = moscow_today()
+      # Новый словарь вместо изменения старого: читатели видят либо старый набор, либо новый
+      bundles = {known: other for known, other in self._bundles.items() if known >= today}
+      bundles[day] = bundle
+      self._bundles = bundles
+      logger.info("Day bundle for %s ready: %d tasks, %d images", day, len(tasks), len(entries))
+      return bundle
+
+   async def _rebuild(self, day: date) -> None:
+      try:
+         await self.prepare(day)
+      except Exception as e:
+         logger.error("Failed to rebuild day bundle for %s: %s", day, e, exc_info=True)
+
+   def on_tasks_event(self, data: dict[str, Any]) -> None:
+      self._generation += 1
+      days = list(self._bundles)
+      self._bundles = {}
+      for day in days:
+         spawn(self._rebuild(day), name=f'rollover:{day}')
+
+day_rollover = DayRollover()
+invalidation.subscribe('tasks', day_rollover.on_tasks_event)
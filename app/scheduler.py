@@ -0,0 +1,221 @@
+"""
+In-process job scheduler working in Moscow time.
+
+Jobs have cron-like schedules ("minute hour day month weekday"). A job with
+catch_up runs once right after start if its last slot was missed while the
+bot was down. Jobs marked single_instance run on one replica only: the slot
+is taken under a Postgres advisory lock and recorded in job_runs. A failed
+run stays unrecorded; jobs with retry_delay run it again until it succeeds
+or the next slot comes.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+
+import app.database.requests as db_requests
+from app.database.models import engine
+from app.helpers.time_helper import MOSCOW_TZ, moscow_now
+
+logger = logging.getLogger(__name__)
+
+# Больше стольких пропущенных слотов назад не ищем (задача раз в минуту за неделю простоя)
+MAX_CATCH_UP_SLOTS = 10_080
+
+JobFunc = Callable[[datetime], Awaitable[None]]
+
+
+def _parse_field(spec: str, low: int, high: int) -> frozenset[int]:
+   values = set()
+   for part in spec.split(','):
+      part, _, step = part.partition('/')
+      if part == '*':
+         start, end = low, high
+      elif '-' in part:
+         start, end = map(int, part.split('-'))
+      else:
+         start = end = int(part)
+         if step:
+            end = high
+      if not (low <= start <= end <= high):
+         raise ValueError(f"Cron field {spec!r} is out of range {low}-{high}")
+      values.update(range(start, end + 1, int(step) if step else 1))
+   return frozenset(values)
+
+
+class Cron:
+   """Five-field cron expression: minute hour day-of-month month day-of-week (0 = Sunday)."""
+
+   def __init__(self, expression: str):
+      fields = expression.split()
+      if len(fields) != 5:
+         raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+      self.expression = expression
+      self.minutes = sorted(_parse_field(fields[0], 0, 59))
+      self.hours = sorted(_parse_field(fields[1], 0, 23))
+      self.days = _parse_field(fields[2], 1, 31)
+      self.months = _parse_field(fields[3], 1, 12)
+      self.weekdays = frozenset(day % 7 for day in _parse_field(fields[4], 0, 7))
+      # Как в cron: если ограничены и число, и день недели, подходит любое из двух
+      self._any_day = fields[2] == '*'
+      self._any_weekday = fields[4] == '*'
+
+   def _day_matches(self, day: date) -> bool:
+      if day.month not in self.months:
+         return False
+      by_day = day.day in self.days
+      by_weekday = (day.isoweekday() % 7) in self.weekdays
+      if self._any_day or self._any_weekday:
+         return by_day and by_weekday
+      return by_day or by_weekday
+
+   def next_after(self, moment: datetime) -> datetime:
+      """First slot strictly after `moment`, as an aware Moscow datetime."""
+      moment = moment.astimezone(MOSCOW_TZ)
+      day = moment.date()
+      for _ in range(366 * 5):
+         if self._day_matches(day):
+            for hour in self.hours:
+               for minute in self.minutes:
+                  slot = MOSCOW_TZ.localize(datetime.combine(day, time(hour, minute)))
+                  if slot > moment:
+                     return slot
+         day += timedelta(days=1)
+      raise ValueError(f"Cron expression {self.expression!r} never fires")
+
+   def __str__(self) -> str:
+      return self.expression
+
+
+@dataclass(slots=True)
+class Job:
+   name: str
+   cron: Cron
+   func: JobFunc
+   catch_up: bool = True
+   single_instance: bool = True
+   retry_delay: float | None = None
+
+
+class Scheduler:
+   def __init__(self):
+      self._jobs: dict[str, Job] = {}
+      self._tasks: list[asyncio.Task] = []
+
+   def add_job(
+      self,
+      name: str,
+      schedule: str,
+      func: JobFunc,
+      catch_up: bool = True,
+      single_instance: bool = True,
+      retry_delay: float | None = None,
+   ) -> None:
+      """
+      Register `func(slot)` to run on `schedule` (cron, Moscow time). Jobs that only
+      touch this process's memory should pass single_instance=False. With `retry_delay`
+      a slot whose run raised is retried every `retry_delay` seconds.
+      """
+      if name in self._jobs:
+         raise ValueError(f"Job {name!r} is already registered")
+      self._jobs[name] = Job(name, Cron(schedule), func, catch_up, single_instance, retry_delay)
+
+   def start(self) -> None:
+      for job in self._jobs.values():
+         self._tasks.append(asyncio.create_task(self._run(job), name=f"job:{job.name}"))
+      logger.info("Scheduler started with %d jobs", len(self._jobs))
+
+   async def stop(self) -> None:
+      for task in self._tasks:
+         task.cancel()
+      await asyncio.gather(*self._tasks, return_exceptions=True)
+      self._tasks.clear()
+
+   async def _run(self, job: Job) -> None:
+      if job.catch_up and job.single_instance:
+         missed = await self._missed_slot(job)
+         if missed:
+            logger.info("Job %s missed its %s run, catching up", job.name, missed)
+            await self._execute_with_retries(job, missed)
+
+      while True:
+         slot = job.cron.next_after(moscow_now())
+         # Спим до слота; после сна сверяемся с часами еще раз
+         while (delay := (slot - moscow_now()).total_seconds()) > 0:
+            await asyncio.sleep(delay)
+         await self._execute_with_retries(job, slot)
+
+   async def _execute_with_retries(self, job: Job, slot: datetime) -> None:
+      while not await self._execute(job, slot) and job.retry_delay:
+         # Следующий слот сделает ту же работу - повторять прошлый уже незачем
+         if moscow_now() + timedelta(seconds=job.retry_delay) >= job.cron.next_after(slot):
+            logger.warning("Job %s for %s not retried: the next slot is due", job.name, slot)
+            return
+         logger.info("Retrying job %s for %s in %s s", job.name, slot, job.retry_delay)
+         await asyncio.sleep(job.retry_delay)
+
+   async def _missed_slot(self, job: Job) -> datetime | None:
+      """The latest slot between the last recorded run and now, if any."""
+      try:
+         last = await db_requests.get_job_last_slot(job.name)
+         if last is None:
+            # Задача новая: догонять нечего, отсчет начнем с текущего момента
+            await db_requests.save_job_slot(job.name, moscow_now())
+            return None
+      except Exception as e:
+         logger.error("Failed to read last run of job %s: %s", job.name, e, exc_info=True)
+         return None
+
+      now = moscow_now()
+      missed = None
+      slot = job.cron.next_after(last)
+      for _ in range(MAX_CATCH_UP_SLOTS):
+         if slot > now:
+            break
+         missed = slot
+         slot = job.cron.next_after(slot)
+      return missed
+
+   async def _execute(self, job: Job, slot: datetime) -> bool:
+      """Run the slot unless it is taken elsewhere. False if it needs another attempt."""
+      if not job.single_instance:
+         return await self._call(job, slot)
+
+      try:
+         async with engine.connect() as conn:
+            lock_key = f"kislorod-job:{job.name}"
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {'key': lock_key})
+            await conn.commit()
+            if not locked:
+               logger.info("Job %s for %s is running on another instance", job.name, slot)
+               return True
+            try:
+               # Другая реплика могла уже отработать этот слот и отпустить блокировку
+               last = await db_requests.get_job_last_slot(job.name)
+               if last is not None and last >= slot:
+                  return True
+               if not await self._call(job, slot):
+                  return False
+               await db_requests.save_job_slot(job.name, slot)
+               return True
+            finally:
+               await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {'key': lock_key})
+               await conn.commit()
+      except Exception as e:
+         logger.error("Job %s for %s could not be scheduled: %s", job.name, slot, e, exc_info=True)
+         return False
+
+   async def _call(self, job: Job, slot: datetime) -> bool:
+      logger.info("Running job %s for %s", job.name, slot)
+      try:
+         await job.func(slot)
+         return True
+      except Exception as e:
+         logger.error("Job %s for %s failed: %s", job.name, slot, e, exc_info=True)
+         return False
+
+
+scheduler = Scheduler()
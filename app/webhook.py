@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import (
+   WEBHOOK_URL,
+   WEBHOOK_PATH,
+   WEBHOOK_SECRET,
+   WEBHOOK_HOST,
+   WEBHOOK_PORT,
+   UPDATES_MAX_IN_FLIGHT,
+   SHUTDOWN_DRAIN_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+   """
+   Webhook handler that processes updates in background tasks, but no more than
+   `max_in_flight` at once. When the limit is reached the HTTP response is delayed,
+   so Telegram slows down instead of us piling up tasks.
+   """
+
+   def __init__(self, dispatcher: Dispatcher, bot: Bot, max_in_flight: int, **kwargs: Any):
+      super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+      self._in_flight = asyncio.Semaphore(max_in_flight)
+
+   async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+      update = await request.json(loads=bot.session.json_loads)
+      await self._in_flight.acquire()
+      task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+      self._background_feed_update_tasks.add(task)
+      task.add_done_callback(self._background_feed_update_tasks.discard)
+      task.add_done_callback(lambda _: self._in_flight.release())
+      return web.json_response({}, dumps=bot.session.json_dumps)
+
+   async def close(self) -> None:
+      if self._background_feed_update_tasks:
+         logger.info("Waiting for %d updates in progress", len(self._background_feed_update_tasks))
+         await asyncio.wait(self._background_feed_update_tasks, timeout=SHUTDOWN_DRAIN_TIMEOUT)
+      # Сессию бота не закрываем: ею еще пользуются фоновые задачи, ее закрывает run.py
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+   """Register the webhook in Telegram and serve updates until SIGTERM/SIGINT or cancellation."""
+   if not WEBHOOK_URL:
+      raise RuntimeError("WEBHOOK_URL is not set")
+
+   app = web.Application()
+   handler = BoundedRequestHandler(
+      dispatcher=dp,
+      bot=bot,
+      max_in_flight=UPDATES_MAX_IN_FLIGHT,
+      secret_token=WEBHOOK_SECRET,
+   )
+   handler.register(app, path=WEBHOOK_PATH)
+   setup_application(app, dp, bot=bot)
+
+   await bot.set_webhook(
+      url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+      secret_token=WEBHOOK_SECRET,
+      allowed_updates=dp.resolve_used_update_types(),
+   )
+
+   runner = web.AppRunner(app)
+   await runner.setup()
+   site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+   await site.start()
+   logger.info("Webhook server listening on %s:%d%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+
+   # В поллинге сигналы обрабатывает aiogram, здесь - сами: docker stop присылает SIGTERM,
+   # и без обработчика процесс завершится, не выполнив остановку в run.py
+   stop = asyncio.Event()
+   loop = asyncio.get_running_loop()
+   for sig in (signal.SIGTERM, signal.SIGINT):
+      with suppress(NotImplementedError):
+         loop.add_signal_handler(sig, stop.set)
+   try:
+      await stop.wait()
+      logger.info("Stopping webhook server")
+   finally:
+      for sig in (signal.SIGTERM, signal.SIGINT):
+         with suppress(NotImplementedError):
+            loop.remove_signal_handler(sig)
+      await runner.cleanup()
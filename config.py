@@ -25,4 +25,39 @@ if not TARGET_DB_URL:
 	pg_port = os.getenv('POSTGRES_PORT')
 	pg_db = os.getenv('POSTGRES_DB')
 	TARGET_DB_URL = f"postgresql+asyncpg://{pg_user}:{pg_password}@{pg_host}:{pg_port}/{pg_db}"
-REGISTER_CODE = os.getenv('REGISTER_CODE')
\ No newline at end of file
+REGISTER_CODE = os.getenv('REGISTER_CODE')
+
+# Служебный чат, в который заранее загружаются картинки из public/
+MEDIA_CHAT_ID = int(os.getenv('MEDIA_CHAT_ID')) if os.getenv('MEDIA_CHAT_ID') else None
+MEDIA_WARMUP_CONCURRENCY = int(os.getenv('MEDIA_WARMUP_CONCURRENCY', '4'))
+# Каталог с оптимизированными картинками (python -m app.media.optimize)
+MEDIA_BUILD_DIR = os.getenv('MEDIA_BUILD_DIR', 'build/public')
+
+# Окно (мс), за которое отметки на мероприятиях собираются в один запрос; 0 - без группировки
+CHECKIN_COALESCE_MS = int(os.getenv('CHECKIN_COALESCE_MS', '0'))
+# Какие мероприятия показывать в /checkin: сколько часов назад прошли и через сколько начнутся
+CHECKIN_WINDOW_PAST_HOURS = int(os.getenv('CHECKIN_WINDOW_PAST_HOURS', '72'))
+CHECKIN_WINDOW_FUTURE_HOURS = int(os.getenv('CHECKIN_WINDOW_FUTURE_HOURS', '24'))
+
+# Режим вебхука (python run.py --mode webhook): публичный адрес, путь и секрет для Telegram
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+
+# Ограничения исходящих сообщений: всего в секунду, и в один чат (в секунду и пачкой подряд)
+SEND_RATE_PER_SECOND = float(os.getenv('SEND_RATE_PER_SECOND', '30'))
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', '1'))
+SEND_CHAT_BURST = float(os.getenv('SEND_CHAT_BURST', '3'))
+
+# Когда рассылать послание дня всем участникам (cron по Москве, например "0 10 * * *"); пусто - не рассылать
+BROADCAST_CRON = os.getenv('BROADCAST_CRON')
+
+# Когда собирать задания, подписи и картинки следующего дня (cron по Москве, незадолго до полуночи)
+ROLLOVER_CRON = os.getenv('ROLLOVER_CRON', '55 23 * * *')
+
+# Сколько апдейтов обрабатывать одновременно (и в поллинге, и в вебхуке)
+UPDATES_MAX_IN_FLIGHT = int(os.getenv('UPDATES_MAX_IN_FLIGHT', '100'))
+# Сколько при остановке ждать апдейты, обработка которых уже началась (сек)
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '10'))
@@ -1,11 +1,42 @@
+import argparse
 import asyncio
 import logging
 import sys
+from datetime import timedelta
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 from aiogram.types import BotCommand
-from config import TOKEN, set_timezone
+from config import (
+   TOKEN,
+   MEDIA_CHAT_ID,
+   MEDIA_WARMUP_CONCURRENCY,
+   SEND_RATE_PER_SECOND,
+   SEND_CHAT_RATE,
+   SEND_CHAT_BURST,
+   BROADCAST_CRON,
+   ROLLOVER_CRON,
+   UPDATES_MAX_IN_FLIGHT,
+   SHUTDOWN_DRAIN_TIMEOUT,
+   set_timezone,
+)
 from app.handlers import router
+from app.database import invalidation
+from app.database.fsm_storage import PostgresStorage
 from app.database.models import async_main
+from app.helpers.rank_index import load_rank_index
+from app.helpers.time_helper import moscow_today
+from app.middlewares import (
+   RegisteredUserMiddleware,
+   SendQueueMiddleware,
+   SendScheduler,
+   UpdateFlowMiddleware,
+   registered_users,
+)
+from app.media import load_file_ids, media_catalog, warm_up_media
+from app.broadcast import RETRY_DELAY as BROADCAST_RETRY_DELAY, broadcast_daily_message
+from app.rollover import day_rollover
+from app.scheduler import scheduler
+from app.webhook import run_webhook
 
 # Настройка логирования
 logging.basicConfig(
@@ -28,7 +59,46 @@ COMMANDS = [
    BotCommand(command="/help", description="Показать список доступных команд")
 ]
 
-async def main():
+def parse_args() -> argparse.Namespace:
+   parser = argparse.ArgumentParser(description="Kislorod New Year bot")
+   parser.add_argument(
+      '--mode',
+      choices=('polling', 'webhook'),
+      default='polling',
+      help="получать апдейты long polling'ом или через вебхук (aiohttp)"
+   )
+   return parser.parse_args()
+
+def register_jobs(bot: Bot) -> None:
+   async def refresh_media(slot):
+      # Каталог у каждого процесса свой, поэтому задача не единственная на кластер
+      await media_catalog.refresh()
+
+   scheduler.add_job('media_refresh', '0 0 * * *', refresh_media, catch_up=False, single_instance=False)
+
+   async def prepare_next_day(slot):
+      await day_rollover.prepare(slot.date() + timedelta(days=1), bot, MEDIA_CHAT_ID)
+
+   # Пакет следующего дня живет в памяти процесса, поэтому его готовит каждый процесс
+   scheduler.add_job('day_rollover', ROLLOVER_CRON, prepare_next_day, catch_up=False, single_instance=False)
+
+   if MEDIA_CHAT_ID:
+      async def warm_up(slot):
+         await warm_up_media(bot, MEDIA_CHAT_ID, concurrency=MEDIA_WARMUP_CONCURRENCY)
+
+      scheduler.add_job('media_warmup', '5 0 * * *', warm_up)
+
+   if BROADCAST_CRON:
+      async def broadcast(slot):
+         # Догоняющий запуск рассылает послание того дня, на который он был запланирован
+         progress = await broadcast_daily_message(bot, slot.date())
+         if progress and progress.deferred:
+            # Слот не отмечаем выполненным - планировщик повторит рассылку
+            raise RuntimeError(f"{progress.deferred} recipients deferred")
+
+      scheduler.add_job('daily_broadcast', BROADCAST_CRON, broadcast, retry_delay=BROADCAST_RETRY_DELAY)
+
+async def main(mode: str = 'polling'):
    try:
       logger.info("Initializing database...")
       await async_main()
@@ -36,22 +106,80 @@ async def main():
    except Exception as e:
       logger.critical("Failed to initialize database: %s", e, exc_info=True)
       sys.exit(1)
+
+   invalidation.start_listener()
+   ranked_users = await load_rank_index()
+   logger.info("Rank index loaded for %d users", ranked_users)
+   cached_users = await registered_users.load()
+   logger.info("Registered users cache loaded: %d users", cached_users)
+   await media_catalog.refresh()
+   cached_media = await load_file_ids()
+   logger.info("Media catalog: %d files, %d cached file_ids", len(media_catalog.entries()), cached_media)
    
    set_timezone()
+
+   # Бот мог стартовать посреди дня - собираем пакет текущего дня сразу
+   try:
+      await day_rollover.prepare(moscow_today())
+   except Exception as e:
+      logger.error("Failed to prepare today's bundle: %s", e, exc_info=True)
    
    if not TOKEN:
       logger.critical("TOKEN is not set!")
       sys.exit(1)
    
    bot = Bot(token=TOKEN)
-   dp = Dispatcher()
+   # Все исходящие сообщения идут через общую очередь с учетом лимитов Telegram
+   bot.session.middleware(SendQueueMiddleware(
+      SendScheduler(rate=SEND_RATE_PER_SECOND, chat_rate=SEND_CHAT_RATE, chat_burst=SEND_CHAT_BURST)
+   ))
+   # Состояния FSM хранятся в Postgres: переживают перезапуск и общие для нескольких реплик
+   storage = PostgresStorage()
+   # Апдейты одного пользователя обрабатываются по очереди, разных - параллельно:
+   # блокировка пользователя берется до чтения состояния FSM
+   dp = Dispatcher(storage=storage, events_isolation=SimpleEventIsolation())
+   update_flow = UpdateFlowMiddleware()
+   update_flow.setup(dp)
+   # Зарегистрированный пользователь попадает в хендлеры как `user` без запроса к БД
+   dp.message.outer_middleware(RegisteredUserMiddleware())
+   dp.callback_query.outer_middleware(RegisteredUserMiddleware())
    dp.include_router(router)
    await bot.set_my_commands(COMMANDS)
    logger.info("Bot started successfully")
+
+   # Прогрев кэша картинок в фоне, чтобы не задерживать запуск поллинга
+   warmup_task = None
+   if MEDIA_CHAT_ID:
+      warmup_task = asyncio.create_task(
+         warm_up_media(bot, MEDIA_CHAT_ID, concurrency=MEDIA_WARMUP_CONCURRENCY)
+      )
    
+   register_jobs(bot)
+   scheduler.start()
+
    try:
-      await dp.start_polling(bot)
+      if mode == 'webhook':
+         await run_webhook(bot, dp)
+      else:
+         # Вебхук, оставшийся от запуска в другом режиме, мешает getUpdates
+         await bot.delete_webhook()
+         # Пока заняты все слоты обработки, новые апдейты не запрашиваются.
+         # Сессию бота закрываем сами - после того, как дождемся начатых апдейтов
+         await dp.start_polling(
+            bot,
+            tasks_concurrency_limit=UPDATES_MAX_IN_FLIGHT,
+            close_bot_session=False,
+         )
    finally:
+      # Новые апдейты уже не приходят, доделываем начатые, пока живы БД и сессия бота
+      await update_flow.drain(SHUTDOWN_DRAIN_TIMEOUT)
+      if warmup_task and not warmup_task.done():
+         warmup_task.cancel()
+      # Фоновые задачи (рассылка, подготовка дня) останавливаем, пока сессия бота еще открыта
+      await scheduler.stop()
+      await bot.session.close()
+      await storage.close()
+      await invalidation.stop_listener()
       # Закрытие соединений с БД при остановке бота
       from app.database.models import engine
       logger.info("Closing database connections...")
@@ -60,7 +188,7 @@ async def main():
 
 if __name__ == '__main__':
    try:
-      asyncio.run(main())
+      asyncio.run(main(parse_args().mode))
    except KeyboardInterrupt:
       logger.info('Bot stopped by user')
    except Exception as e: